@@ -1,22 +1,44 @@
 import numpy as np
 import pandas as pd
 
+def _merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+    2 つの部分集合の (件数, 平均, 偏差平方和) を Chan らの方法で 1 つにまとめます。
+
+    戻り値:
+        tuple: まとめた (件数, 平均, 偏差平方和)
+    """
+    if n_a == 0:
+        return n_b, mean_b.copy(), m2_b.copy()
+    if n_b == 0:
+        return n_a, mean_a.copy(), m2_a.copy()
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + delta ** 2 * (n_a * n_b / n)
+    return n, mean, m2
+
 class UnbiasedStandardScaler:
     """
     Unbiased Standard Scaler (不偏標準化スケーラー)
     
     各特徴量（列）ごとに平均を引き、不偏標準偏差（n-1で割る）でスケーリングします。
     fit() で学習し、transform() で標準化を適用、inverse_transform() で元のスケールに戻せます。
+    partial_fit() でデータを分割して順に学習でき、merge() で別々に学習したスケーラーをまとめられます。
 
     属性:
         __mean (numpy.ndarray): 各列の平均値（外部から変更不可）
         __std (numpy.ndarray): 各列の不偏標準偏差（外部から変更不可）
+        __n (int): 学習したサンプル数
+        __m2 (numpy.ndarray): 各列の偏差平方和（partial_fit / merge 用）
     """
 
     def __init__(self):
         """UnbiasedStandardScaler のインスタンスを初期化"""
         self.__mean = None  # 平均（外部から変更不可）
         self.__std = None   # 不偏標準偏差（外部から変更不可）
+        self.__n = 0
+        self.__m2 = None
 
     def fit(self, X):
         """
@@ -32,44 +54,196 @@ class UnbiasedStandardScaler:
         X = np.asarray(X)
         self.__mean = X.mean(axis=0)
         self.__std = X.std(axis=0, ddof=1)  # 不偏標準偏差 (n-1 で割る)
+        self.__n = X.shape[0]
+        self.__m2 = self.__std ** 2 * (self.__n - 1) if self.__n > 1 else np.zeros_like(self.__mean, dtype=np.float64)
         return self
 
-    def transform(self, X):
+    def partial_fit(self, X):
+        """
+        データ X を追加で学習し、これまでの結果と合わせた平均と不偏標準偏差に更新します。
+
+        チャンクごとに平均と偏差平方和を求めてから Chan らの方法でまとめるため、
+        全データを一度に fit() した場合と浮動小数点の誤差の範囲で一致します。
+
+        パラメータ:
+            X (numpy.ndarray or pandas.DataFrame): 追加で学習する 2D データ (形状: [サンプル数, 特徴量数])
+
+        戻り値:
+            self (UnbiasedStandardScaler): 学習済みのスケーラーオブジェクト
+        """
+        X = np.asarray(X)
+        n = X.shape[0]
+        if n == 0:
+            return self
+        mean = X.mean(axis=0)
+        m2 = ((X - mean) ** 2).sum(axis=0)
+        return self._update(n, mean, m2)
+
+    def fit_chunks(self, chunks):
+        """
+        チャンクの並び（Database.iter_dataframe や iter_columnar の結果など）を順に学習します。
+        それまでの学習結果は破棄し、メモリにはチャンク 1 つ分だけを保持します。
+
+        パラメータ:
+            chunks (Iterable[numpy.ndarray or pandas.DataFrame]): 2D データのチャンク
+
+        戻り値:
+            self (UnbiasedStandardScaler): 学習済みのスケーラーオブジェクト
+        """
+        self.__init__()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def merge(self, other):
+        """
+        別に学習したスケーラー（別プロセスで学習したものなど）の結果をまとめます。
+
+        パラメータ:
+            other (UnbiasedStandardScaler or dict): まとめるスケーラー、または get_state() の戻り値
+
+        戻り値:
+            self (UnbiasedStandardScaler): まとめた結果を持つスケーラーオブジェクト
+        """
+        state = other if isinstance(other, dict) else other.get_state()
+        if state["n"] == 0:
+            return self
+        return self._update(state["n"], np.asarray(state["mean"]), np.asarray(state["m2"]))
+
+    def _update(self, n, mean, m2):
+        if self.__n and np.shape(mean) != np.shape(self.__mean):
+            raise ValueError("特徴量の数が学習済みのデータと一致しません。")
+        self.__n, self.__mean, self.__m2 = _merge_moments(
+            self.__n, self.__mean, self.__m2, n, np.asarray(mean, dtype=np.float64), np.asarray(m2, dtype=np.float64)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.__std = np.sqrt(self.__m2 / (self.__n - 1)) if self.__n > 1 else np.full_like(self.__m2, np.nan)
+        return self
+
+    def get_state(self):
+        """
+        学習結果（サンプル数・平均・偏差平方和）を、プロセス間で受け渡しできる辞書で返します。
+
+        戻り値:
+            dict: {"n": int, "mean": numpy.ndarray, "m2": numpy.ndarray}
+        """
+        return {
+            "n": self.__n,
+            "mean": self.__mean.copy() if self.__mean is not None else None,
+            "m2": self.__m2.copy() if self.__m2 is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        get_state() の辞書からスケーラーを復元します。
+
+        パラメータ:
+            state (dict): get_state() の戻り値
+
+        戻り値:
+            UnbiasedStandardScaler: 復元したスケーラーオブジェクト
+        """
+        return cls().merge(state)
+
+    def _params(self, dtype):
+        """
+        dtype に合わせた平均と、ゼロ除算しない標準偏差を返します。
+
+        分散が 0 の列（と標準偏差が求まらない列）は 1 で割るため、その列は平均を引いた値（0）になります。
+        """
+        if self.__mean is None or self.__std is None:
+            raise ValueError("Scaler has not been fitted yet.")
+        std = np.where((self.__std == 0) | ~np.isfinite(self.__std), 1.0, self.__std)
+        return self.__mean.astype(dtype, copy=False), std.astype(dtype, copy=False)
+
+    @staticmethod
+    def _prepare(X, copy, out):
+        # 結果の配列を用意する（浮動小数点の入力は dtype を保ち、それ以外は float64 にする）
+        X = np.asarray(X)
+        dtype = X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+        if out is None:
+            if not copy and X.dtype == dtype and X.flags.writeable:
+                out = X  # 入力を書き換える
+            else:
+                out = np.empty(X.shape, dtype=dtype)
+        return X, out
+
+    def transform(self, X, copy=True, out=None):
         """
         学習済みの平均と標準偏差を使用して X を標準化します。
 
+        一時配列を作らずに結果の配列へ直接書き込みます。float32 の入力は float32 のまま計算します。
+
         パラメータ:
             X (numpy.ndarray or pandas.DataFrame): 標準化する 2D データ
+            copy (bool): False の場合、X が書き込み可能な浮動小数点の配列なら X を書き換えて返す
+            out (numpy.ndarray): 結果を書き込む配列（指定時は copy より優先）
 
         戻り値:
             numpy.ndarray: 標準化されたデータ（Zスコア変換後の値）
         """
-        if self.__mean is None or self.__std is None:
-            raise ValueError("Scaler has not been fitted yet.")
-        
+        X, out = self._prepare(X, copy, out)
+        mean, std = self._params(out.dtype)
+
         # 標準化の計算
-        X = np.asarray(X)
-        X_scaled = (X - self.__mean) / self.__std
-        
+        np.subtract(X, mean, out=out, casting="unsafe")
+        np.divide(out, std, out=out)
+
         # 結果は常に numpy.ndarray として返す
-        return X_scaled
+        return out
 
-    def inverse_transform(self, X_scaled):
+    def inverse_transform(self, X_scaled, copy=True, out=None):
         """
         標準化されたデータを元のスケールに戻します。
 
         パラメータ:
             X_scaled (numpy.ndarray): 標準化済みの 2D データ
+            copy (bool): False の場合、X_scaled が書き込み可能な浮動小数点の配列なら X_scaled を書き換えて返す
+            out (numpy.ndarray): 結果を書き込む配列（指定時は copy より優先）
 
         戻り値:
             numpy.ndarray: 元のスケールに戻したデータ
         """
-        if self.__mean is None or self.__std is None:
-            raise ValueError("Scaler has not been fitted yet.")
-        
+        X_scaled, out = self._prepare(X_scaled, copy, out)
+        mean, std = self._params(out.dtype)
+
         # 元のスケールに戻す
-        X_restored = X_scaled * self.__std + self.__mean
-        return X_restored
+        np.multiply(X_scaled, std, out=out, casting="unsafe")
+        np.add(out, mean, out=out)
+        return out
+
+    def transform_chunked(self, X, out=None, chunk_bytes=64 * 1024 ** 2, inverse=False):
+        """
+        メモリに載らない大きな配列を、行のチャンクごとに標準化します。
+
+        X に .npy のパスを渡すとメモリマップで読み込み、out に .npy のパスを渡すと
+        同じ形の .npy ファイルを作って書き込みます。メモリ使用量はおよそ chunk_bytes で抑えられます。
+
+        パラメータ:
+            X (numpy.ndarray or str): 標準化する 2D データ、または .npy ファイルのパス
+            out (numpy.ndarray or str): 結果を書き込む配列、または .npy ファイルのパス（None なら新しい配列）
+            chunk_bytes (int): 1 回に処理するチャンクの大きさ（バイト）
+            inverse (bool): True なら inverse_transform を適用する
+
+        戻り値:
+            numpy.ndarray: 結果の配列（out にパスを渡した場合はメモリマップ）
+        """
+        if isinstance(X, str):
+            X = np.load(X, mmap_mode="r")
+        dtype = X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+        if isinstance(out, str):
+            out = np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=X.shape)
+        elif out is None:
+            out = np.empty(X.shape, dtype=dtype)
+        row_bytes = max(int(np.prod(X.shape[1:], dtype=np.int64)) * out.dtype.itemsize, 1)
+        step = max(chunk_bytes // row_bytes, 1)
+        apply = self.inverse_transform if inverse else self.transform
+        for start in range(0, X.shape[0], step):
+            apply(X[start:start + step], out=out[start:start + step])
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
 
     def get_mean(self):
         """
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# aggregate_transform_multi で指定できる集約名
+AGGREGATIONS = ("mean", "max", "min", "sum", "count", "geometric_mean", "std")
 
 def aggregate_transform(
     df: pd.DataFrame,
@@ -43,53 +46,414 @@ def aggregate_transform(
 
     return df.groupby(group_cols)[target_col].transform(lambda x: aggregate(df.loc[x.index]))
 
+def range_mask(
+    df: pd.DataFrame,
+    x_col: Optional[str] = None,
+    y_col: Optional[str] = None,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None
+) -> np.ndarray:
+    """
+    x/y の範囲条件を満たす行を True とするブール配列を返す。
+
+    aggregate_transform と同じく、列名と範囲の両方が指定された軸だけを判定します。
+    値が NaN の行は範囲外 (False) として扱います。
+
+    Returns:
+        np.ndarray: 長さ len(df) のブール配列
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if x_col and x_range:
+        x = df[x_col].to_numpy()
+        mask &= (x >= x_range[0]) & (x <= x_range[1])
+    if y_col and y_range:
+        y = df[y_col].to_numpy()
+        mask &= (y >= y_range[0]) & (y <= y_range[1])
+    return mask
+
+def _normalize_aggs(aggs: Union[List[str], Dict[str, str]]) -> Dict[str, str]:
+    """集約指定を {出力列名: 集約名} の辞書に揃える。"""
+    if isinstance(aggs, dict):
+        named = dict(aggs)
+    else:
+        named = {name: name for name in aggs}
+    for name in named.values():
+        if name not in AGGREGATIONS:
+            raise ValueError(f"未対応の集約です: {name} (対応: {', '.join(AGGREGATIONS)})")
+    return named
+
+def _group_table(
+    codes: np.ndarray,
+    values: np.ndarray,
+    ngroups: int,
+    named: Dict[str, str]
+) -> Dict[str, np.ndarray]:
+    """
+    フィルタ済みの (グループ番号, 値) から、グループ番号順に並んだ集約値の配列を作る。
+
+    values に 1 行も現れないグループは NaN になります。
+    """
+    index = pd.RangeIndex(ngroups)
+    grouped = pd.Series(values).groupby(codes)
+    table = {}
+    for out_col, name in named.items():
+        if name == "geometric_mean":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                logs = np.log(values)
+            result = np.exp(pd.Series(logs).groupby(codes).mean())
+        elif name == "std":
+            result = grouped.std(ddof=1)
+        else:
+            result = getattr(grouped, name)()
+        table[out_col] = result.reindex(index).to_numpy(dtype=float)
+    return table
+
+def aggregate_transform_multi(
+    df: pd.DataFrame,
+    aggs: Union[List[str], Dict[str, str]],
+    group_cols: List[str],
+    target_col: str,
+    x_col: Optional[str] = None,
+    y_col: Optional[str] = None,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None
+) -> pd.DataFrame:
+    """
+    複数の集約を 1 回のグループ化でまとめて計算し、各行に適用する。
+
+    aggregate_transform をベクトル化したもので、範囲フィルタはブール配列として最初に
+    1 回だけ適用し、グループ化も 1 回だけ行います。フィルタ後に行が残らないグループは
+    aggregate_transform と同じく NaN になります。
+
+    Parameters:
+        df (pd.DataFrame): 入力データフレーム
+        aggs (Union[List[str], Dict[str, str]]): 集約名のリスト、または {出力列名: 集約名} の辞書。
+            集約名は mean, max, min, sum, count, geometric_mean, std のいずれか
+            （std は不偏標準偏差、count は NaN を除いた件数）。
+        group_cols (List[str]): グループ化する列のリスト（例: ['id', 'cnt']）
+        target_col (str): 集約する対象の列名（例: 'measure_value'）
+        x_col (Optional[str], optional): x の列名（例: 'x'）。デフォルトは None。
+        y_col (Optional[str], optional): y の列名（例: 'y'）。デフォルトは None。
+        x_range (Optional[Tuple[float, float]], optional): x の範囲 (min, max)。デフォルトは None。
+        y_range (Optional[Tuple[float, float]], optional): y の範囲 (min, max)。デフォルトは None。
+
+    Returns:
+        pd.DataFrame: 集約ごとの列を持ち、df と同じインデックスのデータフレーム
+    """
+    named = _normalize_aggs(aggs)
+    mask = range_mask(df, x_col, y_col, x_range, y_range)
+    values = df[target_col].to_numpy(dtype=float)
+    return pd.DataFrame(_transform_groups(df[group_cols], values, mask, named), index=df.index)
+
+def _transform_groups(
+    keys: pd.DataFrame,
+    values: np.ndarray,
+    mask: np.ndarray,
+    named: Dict[str, str]
+) -> Dict[str, np.ndarray]:
+    """
+    keys の全列でグループ化し、mask が True の行の values を集約して各行に割り当てる。
+
+    Returns:
+        Dict[str, np.ndarray]: 出力列名ごとの、長さ len(keys) の配列
+    """
+    # グループキーが NaN の行は -1 (groupby の既定と同じく集約対象外)
+    grouper = keys.groupby(list(keys.columns), sort=False, dropna=True)
+    codes = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    ngroups = grouper.ngroups
+
+    selected = mask & (codes >= 0)
+    table = _group_table(codes[selected], values[selected], ngroups, named)
+
+    valid = codes >= 0
+    result = {}
+    for out_col, per_group in table.items():
+        column = np.full(len(keys), np.nan)
+        column[valid] = per_group[codes[valid]]
+        result[out_col] = column
+    return result
+
+# StreamingAggregator が保持するグループごとの部分統計
+_PARTIAL_COLS = ["count", "sum", "log_count", "log_sum", "max", "min", "mean", "m2"]
+
+def _chunk_partials(keys: pd.DataFrame, values: np.ndarray) -> pd.DataFrame:
+    """
+    1 チャンク分 (フィルタ済み) のグループごとの部分統計を計算する。
+
+    Returns:
+        pd.DataFrame: グループキーをインデックスとし、_PARTIAL_COLS を列に持つデータフレーム
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(values)
+    frame = keys.assign(_value=values, _log=logs)
+    grouped = frame.groupby(list(keys.columns), sort=False, dropna=True)
+    value = grouped["_value"]
+    partial = pd.DataFrame({
+        "count": value.count(),
+        "sum": value.sum(),
+        "log_count": grouped["_log"].count(),
+        "log_sum": grouped["_log"].sum(),
+        "max": value.max(),
+        "min": value.min(),
+    })
+    partial["mean"] = (partial["sum"] / partial["count"]).fillna(0.0)
+    partial["m2"] = (value.var(ddof=0) * partial["count"]).fillna(0.0)
+    return partial.astype(float)
+
+def _merge_partials(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """
+    2 つの部分統計を結合する。平均と偏差平方和は Chan らの並列マージ式で更新します。
+    """
+    if left.empty:
+        return right.copy()
+    if right.empty:
+        return left.copy()
+    left, right = left.align(right, join="outer")
+    counts = ["count", "sum", "log_count", "log_sum", "mean", "m2"]
+    left[counts] = left[counts].fillna(0.0)
+    right[counts] = right[counts].fillna(0.0)
+
+    n_left = left["count"].to_numpy()
+    n_right = right["count"].to_numpy()
+    n = n_left + n_right
+    delta = right["mean"].to_numpy() - left["mean"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(n > 0, n_right / n, 0.0)
+
+    merged = pd.DataFrame(index=left.index)
+    merged["count"] = n
+    merged["sum"] = left["sum"] + right["sum"]
+    merged["log_count"] = left["log_count"] + right["log_count"]
+    merged["log_sum"] = left["log_sum"] + right["log_sum"]
+    merged["max"] = np.fmax(left["max"].to_numpy(), right["max"].to_numpy())
+    merged["min"] = np.fmin(left["min"].to_numpy(), right["min"].to_numpy())
+    merged["mean"] = left["mean"].to_numpy() + delta * ratio
+    merged["m2"] = left["m2"].to_numpy() + right["m2"].to_numpy() + delta ** 2 * n_left * ratio
+    return merged[_PARTIAL_COLS]
+
+class StreamingAggregator:
+    """
+    チャンク単位でデータを受け取り、グループごとの集約値を計算するクラス。
+
+    aggregate_transform_multi のアウトオブコア版です。各チャンクに範囲フィルタを適用し、
+    グループごとの件数・合計・対数の合計・最大/最小・平均と偏差平方和 (Welford) だけを
+    保持するため、メモリ使用量はチャンクサイズとグループ数で決まり、全体の行数には
+    依存しません。別々に update した集約器は merge で結合できます。
+
+    使用例:
+        agg = StreamingAggregator(['id'], 'measure_value', x_col='x', x_range=(0, 10))
+        for chunk in pd.read_csv('export.csv', chunksize=100_000):
+            agg.update(chunk)
+        table = agg.result(['mean', 'max'])
+    """
+
+    def __init__(
+        self,
+        group_cols: List[str],
+        target_col: str,
+        x_col: Optional[str] = None,
+        y_col: Optional[str] = None,
+        x_range: Optional[Tuple[float, float]] = None,
+        y_range: Optional[Tuple[float, float]] = None
+    ):
+        """
+        Parameters:
+            group_cols (List[str]): グループ化する列のリスト
+            target_col (str): 集約する対象の列名
+            x_col, y_col, x_range, y_range: aggregate_transform と同じ範囲フィルタ
+        """
+        self.group_cols = list(group_cols)
+        self.target_col = target_col
+        self.x_col = x_col
+        self.y_col = y_col
+        self.x_range = x_range
+        self.y_range = y_range
+        self.__partials = pd.DataFrame(columns=_PARTIAL_COLS, dtype=float)
+
+    def update(self, chunk: pd.DataFrame) -> "StreamingAggregator":
+        """
+        1 チャンク分のデータを部分統計に取り込みます。
+
+        Returns:
+            self (StreamingAggregator): 更新後の集約器
+        """
+        mask = range_mask(chunk, self.x_col, self.y_col, self.x_range, self.y_range)
+        if mask.any():
+            keys = chunk.loc[mask, self.group_cols]
+            values = chunk[self.target_col].to_numpy(dtype=float)[mask]
+            self.__partials = _merge_partials(self.__partials, _chunk_partials(keys, values))
+        return self
+
+    def merge(self, other: "StreamingAggregator") -> "StreamingAggregator":
+        """
+        別の集約器 (同じ group_cols と target_col) の部分統計を結合します。
+
+        Returns:
+            self (StreamingAggregator): 結合後の集約器
+        """
+        if other.group_cols != self.group_cols or other.target_col != self.target_col:
+            raise ValueError("group_cols と target_col が一致しない集約器は結合できません")
+        self.__partials = _merge_partials(self.__partials, other.__partials)
+        return self
+
+    def result(self, aggs: Union[List[str], Dict[str, str]]) -> pd.DataFrame:
+        """
+        蓄積した部分統計から、グループごとの集約値のルックアップテーブルを作ります。
+
+        Parameters:
+            aggs (Union[List[str], Dict[str, str]]): aggregate_transform_multi と同じ集約指定
+
+        Returns:
+            pd.DataFrame: グループキーをインデックスとし、集約ごとの列を持つデータフレーム
+        """
+        named = _normalize_aggs(aggs)
+        p = self.__partials
+        count = p["count"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            finals = {
+                "mean": (p["sum"] / count).where(count > 0),
+                "max": p["max"],
+                "min": p["min"],
+                "sum": p["sum"],
+                "count": count,
+                "geometric_mean": np.exp(p["log_sum"] / p["log_count"]).where(p["log_count"] > 0),
+                "std": np.sqrt(p["m2"] / (count - 1)).where(count > 1),
+            }
+        index = p.index
+        if len(self.group_cols) > 1 and not isinstance(index, pd.MultiIndex):
+            # 1 行もフィルタを通らなかった場合は部分統計のインデックスが空の 1 階層になっている
+            index = pd.MultiIndex.from_arrays([[] for _ in self.group_cols])
+        table = pd.DataFrame({out_col: finals[name].to_numpy() for out_col, name in named.items()}, index=index)
+        table.index.names = self.group_cols
+        return table
+
+    def transform(self, chunk: pd.DataFrame, aggs: Union[List[str], Dict[str, str]]) -> pd.DataFrame:
+        """
+        チャンクの各行に、グループごとの集約値を割り当てます（2 パス目用）。
+
+        フィルタ後に行が残らなかったグループやキーが NaN の行は NaN になります。
+
+        Returns:
+            pd.DataFrame: 集約ごとの列を持ち、chunk と同じインデックスのデータフレーム
+        """
+        return _attach(chunk, self.group_cols, self.result(aggs))
+
+def _attach(chunk: pd.DataFrame, group_cols: List[str], table: pd.DataFrame) -> pd.DataFrame:
+    """ルックアップテーブルの値を chunk の各行に割り当てる。"""
+    if len(group_cols) == 1:
+        keys = pd.Index(chunk[group_cols[0]])
+    else:
+        keys = pd.MultiIndex.from_frame(chunk[group_cols])
+    values = table.reindex(keys).to_numpy(dtype=float)
+    return pd.DataFrame(values, columns=table.columns, index=chunk.index)
+
+def aggregate_transform_stream(
+    make_chunks: Callable[[], Iterable[pd.DataFrame]],
+    aggs: Union[List[str], Dict[str, str]],
+    group_cols: List[str],
+    target_col: str,
+    x_col: Optional[str] = None,
+    y_col: Optional[str] = None,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    チャンクの列を 2 回読み、各チャンクの行に集約値を割り当てた結果を順に返す。
+
+    1 パス目で StreamingAggregator に部分統計を蓄積し、2 パス目でルックアップテーブルを
+    各チャンクに割り当てます。結果は aggregate_transform_multi をチャンクごとに切り出した
+    ものと（浮動小数点誤差の範囲で）一致します。
+
+    Parameters:
+        make_chunks (Callable[[], Iterable[pd.DataFrame]]): 呼ぶたびに同じチャンク列を最初から返す関数
+            （例: lambda: pd.read_csv('export.csv', chunksize=100_000)）
+        aggs, group_cols, target_col, x_col, y_col, x_range, y_range: aggregate_transform_multi と同じ
+
+    Returns:
+        Iterator[pd.DataFrame]: チャンクごとの集約結果（インデックスはチャンクと同じ）
+    """
+    aggregator = StreamingAggregator(group_cols, target_col, x_col, y_col, x_range, y_range)
+    for chunk in make_chunks():
+        aggregator.update(chunk)
+    table = aggregator.result(aggs)
+    for chunk in make_chunks():
+        yield _attach(chunk, aggregator.group_cols, table)
+
 # 幾何平均の関数
 def geometric_mean(series: pd.Series) -> float:
     return float(np.exp(np.log(series).mean()))
 
-# サンプルデータ
-data = {
-    'group1': [1, 1, 1, 2, 2, 2, 3, 3, 3],
-    'group2': [1, 1, 1, 2, 2, 2, 3, 3, 3],
-    'feature_x': [10, 20, 30, 15, 25, 35, 40, 50, 60],
-    'feature_y': [5, 15, 25, 10, 20, 30, 45, 55, 65],
-    'value_to_aggregate': [1.2, 1.5, 1.8, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5]
-}
-
-df = pd.DataFrame(data)
-
-# 汎用的な引数で集約
-df['geo_mean'] = aggregate_transform(
-    df,
-    geometric_mean,
-    group_cols=['group1', 'group2'],
-    target_col='value_to_aggregate',
-    x_col='feature_x',
-    y_col='feature_y',
-    x_range=(10, 30),
-    y_range=(5, 25)
-)
-
-df['arith_mean'] = aggregate_transform(
-    df,
-    np.mean,
-    group_cols=['group1', 'group2'],
-    target_col='value_to_aggregate',
-    x_col='feature_x',
-    y_col='feature_y',
-    x_range=(10, 30),
-    y_range=(5, 25)
-)
-
-df['max_value'] = aggregate_transform(
-    df,
-    np.max,
-    group_cols=['group1', 'group2'],
-    target_col='value_to_aggregate',
-    x_col='feature_x',
-    y_col='feature_y',
-    x_range=(10, 30),
-    y_range=(5, 25)
-)
-
-print(df)
+if __name__ == "__main__":
+    # サンプルデータ
+    data = {
+        'group1': [1, 1, 1, 2, 2, 2, 3, 3, 3],
+        'group2': [1, 1, 1, 2, 2, 2, 3, 3, 3],
+        'feature_x': [10, 20, 30, 15, 25, 35, 40, 50, 60],
+        'feature_y': [5, 15, 25, 10, 20, 30, 45, 55, 65],
+        'value_to_aggregate': [1.2, 1.5, 1.8, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5]
+    }
+
+    df = pd.DataFrame(data)
+
+    # 汎用的な引数で集約
+    df['geo_mean'] = aggregate_transform(
+        df,
+        geometric_mean,
+        group_cols=['group1', 'group2'],
+        target_col='value_to_aggregate',
+        x_col='feature_x',
+        y_col='feature_y',
+        x_range=(10, 30),
+        y_range=(5, 25)
+    )
+
+    df['arith_mean'] = aggregate_transform(
+        df,
+        np.mean,
+        group_cols=['group1', 'group2'],
+        target_col='value_to_aggregate',
+        x_col='feature_x',
+        y_col='feature_y',
+        x_range=(10, 30),
+        y_range=(5, 25)
+    )
+
+    df['max_value'] = aggregate_transform(
+        df,
+        np.max,
+        group_cols=['group1', 'group2'],
+        target_col='value_to_aggregate',
+        x_col='feature_x',
+        y_col='feature_y',
+        x_range=(10, 30),
+        y_range=(5, 25)
+    )
+
+    print(df)
+
+    # 複数の集約を 1 回でまとめて計算
+    multi = aggregate_transform_multi(
+        df,
+        {'geo_mean': 'geometric_mean', 'arith_mean': 'mean', 'max_value': 'max'},
+        group_cols=['group1', 'group2'],
+        target_col='value_to_aggregate',
+        x_col='feature_x',
+        y_col='feature_y',
+        x_range=(10, 30),
+        y_range=(5, 25)
+    )
+    print(multi)
+
+    # チャンク単位のストリーミング集約（大きな CSV や fetch_dataframe のチャンクを想定）
+    chunks = [df.iloc[i:i + 4] for i in range(0, len(df), 4)]
+    streamed = pd.concat(aggregate_transform_stream(
+        lambda: iter(chunks),
+        {'geo_mean': 'geometric_mean', 'arith_mean': 'mean', 'max_value': 'max'},
+        group_cols=['group1', 'group2'],
+        target_col='value_to_aggregate',
+        x_col='feature_x',
+        y_col='feature_y',
+        x_range=(10, 30),
+        y_range=(5, 25)
+    ))
+    print(streamed)
@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from agg import _normalize_aggs, _transform_groups, aggregate_transform_multi, range_mask
+
+def _create_shared(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, tuple]:
+    """array と同じ形の共有メモリを確保して内容を書き込み、(共有メモリ, ワーカーに渡す仕様) を返す。"""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def _attach_shared(spec: tuple) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = spec
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13 以降
+    except TypeError:
+        # 作成した親プロセスが解放するので、ワーカー側では resource_tracker に登録しない
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def _aggregate_partition(
+    key_specs: Dict[str, tuple],
+    value_spec: tuple,
+    mask_spec: tuple,
+    out_spec: tuple,
+    start: int,
+    stop: int,
+    named: Dict[str, str]
+):
+    """ワーカーで 1 つのパーティション（並べ替え後の行 start:stop）を集約し、結果を共有メモリに書き込む。"""
+    handles = []
+    try:
+        keys = {}
+        for name, spec in key_specs.items():
+            shm, array = _attach_shared(spec)
+            handles.append(shm)
+            keys[name] = array[start:stop]
+        arrays = []
+        for spec in (value_spec, mask_spec, out_spec):
+            shm, array = _attach_shared(spec)
+            handles.append(shm)
+            arrays.append(array)
+        values, mask, out = arrays
+        result = _transform_groups(pd.DataFrame(keys, copy=False), values[start:stop], mask[start:stop], named)
+        for i, column in enumerate(result.values()):
+            out[start:stop, i] = column
+        del keys, values, mask, out, arrays
+    finally:
+        for shm in handles:
+            shm.close()
+
+def _key_arrays(df: pd.DataFrame, group_cols: List[str]) -> Dict[str, np.ndarray]:
+    # 共有メモリに置けるように、数値以外のキー列は整数コードにする（NaN は NaN のまま）
+    keys = {}
+    for col in group_cols:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            keys[col] = series.to_numpy()
+        else:
+            codes, _ = pd.factorize(series, use_na_sentinel=True)
+            keys[col] = np.where(codes >= 0, codes, np.nan) if (codes < 0).any() else codes
+    return keys
+
+def aggregate_transform_parallel(
+    df: pd.DataFrame,
+    aggs: Union[List[str], Dict[str, str]],
+    group_cols: List[str],
+    target_col: str,
+    x_col: Optional[str] = None,
+    y_col: Optional[str] = None,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None,
+    max_workers: Optional[int] = None,
+    n_partitions: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    min_rows: int = 100000
+) -> pd.DataFrame:
+    """
+    aggregate_transform_multi をグループキーのハッシュで分割し、プロセスプールで並列に計算する。
+
+    同じグループの行は必ず同じパーティションに入るため、パーティションごとの結果を
+    元の行順に戻すだけで aggregate_transform_multi と同じ結果になります。
+    キー列・値・範囲フィルタ・結果は共有メモリに置き、ワーカーには名前と範囲だけを渡します。
+
+    Parameters:
+        df (pd.DataFrame): 入力データフレーム
+        aggs (Union[List[str], Dict[str, str]]): aggregate_transform_multi と同じ集約の指定
+        group_cols (List[str]): グループ化する列のリスト
+        target_col (str): 集約する対象の列名
+        x_col, y_col, x_range, y_range: aggregate_transform_multi と同じ範囲フィルタ
+        max_workers (Optional[int]): ワーカー数（None で CPU コア数）
+        n_partitions (Optional[int]): パーティション数（None でワーカー数の 4 倍。負荷の偏りをならす）
+        executor (Optional[Executor]): 使い回すプロセスプール（None なら呼び出しごとに作成する）
+        min_rows (int): これより少ない行数では並列化せずに aggregate_transform_multi を呼ぶ
+
+    Returns:
+        pd.DataFrame: 集約ごとの列を持ち、df と同じインデックスのデータフレーム
+    """
+    named = _normalize_aggs(aggs)
+    max_workers = max_workers or os.cpu_count() or 1
+    if (max_workers <= 1 and executor is None) or len(df) < min_rows:
+        return aggregate_transform_multi(df, named, group_cols, target_col, x_col, y_col, x_range, y_range)
+    n_partitions = n_partitions or max_workers * 4
+
+    # パーティション番号順に（パーティション内では元の順序のまま）行を並べ替える
+    keys = _key_arrays(df, group_cols)
+    # 生の値をハッシュすると -0.0 と 0.0 が別のパーティションに入るため、groupby と同じ同一視をする factorize のコードをハッシュする
+    codes = {col: pd.factorize(array, use_na_sentinel=True)[0] for col, array in keys.items()}
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(codes, copy=False), index=False).to_numpy()
+    del codes
+    partition = (hashes % np.uint64(n_partitions)).astype(np.uint16 if n_partitions <= 65536 else np.intp)
+    order = np.argsort(partition, kind="stable")  # 16 ビット整数の安定ソートは基数ソートになる
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(partition, minlength=n_partitions))])
+
+    mask = range_mask(df, x_col, y_col, x_range, y_range)
+    values = df[target_col].to_numpy(dtype=float)
+    handles = []
+    try:
+        key_specs = {}
+        for col, array in keys.items():
+            shm, key_specs[col] = _create_shared(array[order])
+            handles.append(shm)
+        shm, value_spec = _create_shared(values[order])
+        handles.append(shm)
+        shm, mask_spec = _create_shared(mask[order])
+        handles.append(shm)
+        out_shm, out_spec = _create_shared(np.empty((len(df), len(named))))
+        handles.append(out_shm)
+
+        pool = executor or ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [
+                pool.submit(_aggregate_partition, key_specs, value_spec, mask_spec, out_spec, int(start), int(stop), named)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            for future in futures:
+                future.result()
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+        # 元の行順に戻す
+        out = np.ndarray((len(df), len(named)), dtype=np.float64, buffer=out_shm.buf)
+        result = np.empty_like(out)
+        result[order] = out
+        del out
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+    return pd.DataFrame(result, columns=list(named), index=df.index)
@@ -0,0 +1,153 @@
+import asyncio
+import queue
+import threading
+from typing import Any, Awaitable, Callable, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from d import ConfigMixin, get_stats
+
+# 同期ドライバの URL を非同期ドライバに置き換える
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+class AsyncDatabase(ConfigMixin):
+    # Database と同じ fetch/execute/query を async で提供する（接続は非同期エンジンのプールから借りる）
+    # エンジンの接続はイベントループに結び付くため、1 つのインスタンスは 1 つのループ内で使う
+    def __init__(self, config_path='config.ini'):
+        self.config = self.read_config(config_path)
+        self.engine = self.create_engine()
+        self.stats = get_stats(self.engine.sync_engine, **self.get_stats_options())
+        self.setup_logging()
+
+    def get_async_url(self):
+        # async_url が指定されていればそれを使い、なければ url / 接続情報から非同期ドライバの URL を作る
+        section = self.config['Database']
+        if section.get('async_url', '').strip():
+            return section['async_url']
+        if section.get('url', '').strip():
+            scheme, sep, rest = section['url'].partition('://')
+            return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+        return self.get_connection_string(driver='asyncpg')
+
+    def create_engine(self):
+        return create_async_engine(self.get_async_url(), echo=self.get_echo(), **self.get_pool_options())
+
+    def get_pool_size(self):
+        return self.engine.sync_engine.pool.size() if hasattr(self.engine.sync_engine.pool, 'size') else 1
+
+    async def fetch_all(self, query, params=None):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(text(query), params)
+            rows = result.fetchall()
+        self.stats.record_fetch(query, len(rows))
+        return rows
+
+    async def fetch_one(self, query, params=None):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(text(query), params)
+            row = result.fetchone()
+        self.stats.record_fetch(query, 0 if row is None else 1)
+        return row
+
+    async def fetch_dataframe(self, query, params=None):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(text(query), params)
+            df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        self.stats.record_fetch(query, len(df), int(df.memory_usage(index=False).sum()))
+        return df
+
+    async def execute(self, query, params=None, confirm_delete=False):
+        if "DELETE" in query.upper() and not confirm_delete:
+            raise PermissionError("DELETEクエリを実行するにはconfirm_delete=Trueを指定してください。")
+        async with self.engine.begin() as connection:
+            result = await connection.execute(text(query), params)
+            return result.rowcount
+
+    async def insert(self, query, params=None):
+        return await self.execute(query, params)
+
+    async def update(self, query, params=None):
+        return await self.execute(query, params)
+
+    async def delete(self, query, params=None, confirm_delete=False):
+        return await self.execute(query, params, confirm_delete)
+
+    async def query(self, sql: str, params: dict, create_entity: Callable[[Any], Any]) -> List[Any]:
+        async with self.engine.connect() as connection:
+            result = await connection.execute(text(sql), params)
+            return [create_entity(row) for row in result]
+
+    async def gather(self, *calls: Awaitable, limit: Optional[int] = None) -> List[Any]:
+        # 複数のクエリを同時に実行し、渡した順に結果を返す
+        # 同時実行数はプールサイズ（または limit）までに抑え、プールの待ちでタイムアウトしないようにする
+        semaphore = asyncio.Semaphore(limit or self.get_pool_size())
+
+        async def run(call):
+            async with semaphore:
+                return await call
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+class AsyncBridge:
+    # 別スレッドでイベントループを動かし、GUI のイベントループからコルーチンを投入・結果を回収する
+    # GUI 側は win.read(timeout=...) のたびに poll() を呼び、完了した結果だけを受け取る
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="AsyncBridge", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        # 完了まで待って結果を返す（初期化など、GUI のループ外で使う）
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def submit(self, key, coroutine):
+        # コルーチンをループに投入する。完了すると (key, 結果, 例外) が poll() で取り出せる
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+        def done(f):
+            if f.cancelled():
+                self._results.put((key, None, asyncio.CancelledError()))
+            elif f.exception() is not None:
+                self._results.put((key, None, f.exception()))
+            else:
+                self._results.put((key, f.result(), None))
+        future.add_done_callback(done)
+        return future
+
+    def poll(self):
+        # 完了済みの結果をブロックせずにすべて取り出す
+        completed = []
+        while True:
+            try:
+                completed.append(self._results.get_nowait())
+            except queue.Empty:
+                return completed
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+# 使用例
+if __name__ == "__main__":
+    async def main():
+        db = AsyncDatabase()
+        # 独立した 3 つのクエリを同時に実行（所要時間は最も遅いクエリ程度になる）
+        users, orders, total = await db.gather(
+            db.fetch_dataframe("SELECT * FROM users"),
+            db.fetch_dataframe("SELECT * FROM orders"),
+            db.fetch_one("SELECT count(*) FROM your_table"),
+        )
+        print(users, orders, total)
+        await db.dispose()
+
+    asyncio.run(main())
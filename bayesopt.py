@@ -0,0 +1,349 @@
+import math
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from a import UnbiasedStandardScaler
+
+# 提案に使える獲得関数
+ACQUISITIONS = ("EI", "UCB")
+
+def _norm_pdf(z: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+
+def _norm_cdf(z: np.ndarray) -> np.ndarray:
+    # erf の近似式 (Abramowitz & Stegun 7.1.26, 誤差 1.5e-7 以下) による標準正規分布の累積分布関数
+    x = np.abs(z) / math.sqrt(2)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x ** 2)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+class BayesianOptimizer:
+    """
+    候補点の集合から最大値を探す、ガウス過程 (RBF カーネル) によるベイズ最適化。
+
+    PHYSBO と同じく、あらかじめ与えた候補点から評価する点を選びます。候補点は
+    UnbiasedStandardScaler で標準化し、目的関数の値も平均 0・標準偏差 1 に揃えて扱います。
+
+    観測点を 1 つ追加するたびに、コレスキー分解 L と V = L^-1 K(観測点, 候補点) に 1 行を
+    追加するだけで事後分布を更新するため、1 点あたりの計算量は O(n × 候補点数) です
+    （毎回 O(n^3) の分解をやり直しません）。分解のやり直しはハイパーパラメーター（長さスケール）を
+    学習し直すとき（観測点数が 2 倍になるごと）だけです。
+
+    バッチ提案 (propose(q)) は Kriging believer 法で、選んだ点を予測平均の値で観測したものとして
+    分散だけを更新しながら q 点を選びます。評価中の点 (pending) も同様に扱います。
+
+    使用例:
+        optimizer = BayesianOptimizer(candidates)
+        for index, x, y in run_batches(optimizer, objective, n_evaluations=200, batch_size=4):
+            print(index, x, y)
+        print(optimizer.best())
+    """
+
+    def __init__(
+        self,
+        candidates: np.ndarray,
+        acquisition: str = "EI",
+        noise_var: float = 1e-4,
+        length_scale: Optional[float] = None,
+        n_initial: int = 10,
+        ucb_kappa: float = 2.0,
+        ei_xi: float = 0.01,
+        seed: Optional[int] = None
+    ):
+        """
+        Parameters:
+            candidates (np.ndarray): 候補点 (形状: [候補点数, 次元数])
+            acquisition (str): 獲得関数 ("EI" または "UCB")
+            noise_var (float): 観測ノイズの分散（標準化した目的関数の値に対して）
+            length_scale (Optional[float]): RBF カーネルの長さスケール。None なら周辺尤度で学習する
+            n_initial (int): ランダムに選ぶ最初の点の数（1 以上）
+            ucb_kappa (float): UCB の探索の重み
+            ei_xi (float): EI の改善幅のしきい値
+            seed (Optional[int]): 乱数のシード
+        """
+        if acquisition not in ACQUISITIONS:
+            raise ValueError(f"未対応の獲得関数です: {acquisition} (対応: {', '.join(ACQUISITIONS)})")
+        if n_initial < 1:
+            # 評価済みの点がないとモデルを作れず、何も提案できなくなる
+            raise ValueError(f"n_initial は 1 以上を指定してください: {n_initial}")
+        self.candidates = np.asarray(candidates)
+        self.scaler = UnbiasedStandardScaler().fit(self.candidates)
+        self._C = self.scaler.transform(self.candidates.astype(np.float64, copy=False))
+        self._sq = np.einsum("ij,ij->i", self._C, self._C)
+        self.acquisition = acquisition
+        self.noise_var = noise_var
+        self.learn_length_scale = length_scale is None
+        self.length_scale = length_scale if length_scale is not None else math.sqrt(self._C.shape[1])
+        self.n_initial = n_initial
+        self.ucb_kappa = ucb_kappa
+        self.ei_xi = ei_xi
+        self.rng = np.random.default_rng(seed)
+        self.history: List[Tuple[int, float]] = []  # (候補点の番号, 目的関数の値) を評価順に
+        self.pending: set = set()  # 提案済みで結果を待っている候補点の番号
+        self._lock = threading.RLock()
+        self._next_refit = 2 * n_initial
+        self._reset_factor(16)
+
+    def _reset_factor(self, capacity: int):
+        m = len(self._C)
+        self._n = 0
+        self._L = np.zeros((capacity, capacity))
+        self._V = np.zeros((capacity, m))
+        self._Linv_y = np.zeros(capacity)
+        self._Linv_1 = np.zeros(capacity)
+        self._var_reduction = np.zeros(m)
+
+    def _kernel_row(self, index: int) -> np.ndarray:
+        # k(候補点 index, 全候補点)
+        dist2 = np.maximum(self._sq + self._sq[index] - 2.0 * (self._C @ self._C[index]), 0.0)
+        return np.exp(-0.5 * dist2 / self.length_scale ** 2)
+
+    def _grow(self):
+        # 観測点のバッファを 2 倍に広げる（コピーの回数を対数回に抑える）
+        capacity = 2 * len(self._Linv_y)
+        L = np.zeros((capacity, capacity))
+        L[:self._n, :self._n] = self._L[:self._n, :self._n]
+        V = np.zeros((capacity, len(self._C)))
+        V[:self._n] = self._V[:self._n]
+        self._L, self._V = L, V
+        self._Linv_y = np.resize(self._Linv_y, capacity)
+        self._Linv_1 = np.resize(self._Linv_1, capacity)
+
+    def _append(self, index: int, y: float):
+        # コレスキー分解に 1 行を追加する（観測点は候補点なので L^-1 k は V の列そのもの）
+        n = self._n
+        if n == len(self._Linv_y):
+            self._grow()
+        l = self._V[:n, index]
+        d = math.sqrt(max(1.0 + self.noise_var - float(l @ l), 1e-12))
+        v = (self._kernel_row(index) - l @ self._V[:n]) / d
+        self._L[n, :n] = l
+        self._L[n, n] = d
+        self._V[n] = v
+        self._Linv_y[n] = (y - float(l @ self._Linv_y[:n])) / d
+        self._Linv_1[n] = (1.0 - float(l @ self._Linv_1[:n])) / d
+        self._var_reduction += v ** 2
+        self._n = n + 1
+
+    def _refactor(self):
+        # 全観測点でコレスキー分解をやり直す（長さスケールを変えたとき）
+        indices = np.array([index for index, _ in self.history], dtype=np.int64)
+        y = np.array([value for _, value in self.history])
+        capacity = max(16, 1 << int(len(indices) - 1).bit_length())
+        self._reset_factor(capacity)
+        if len(indices) == 0:
+            return
+        n = len(indices)
+        X = self._C[indices]
+        K = self._kernel(X, X) + self.noise_var * np.eye(n)
+        L = np.linalg.cholesky(K)
+        self._L[:n, :n] = L
+        self._V[:n] = np.linalg.solve(L, self._kernel(X, self._C))
+        self._Linv_y[:n] = np.linalg.solve(L, y)
+        self._Linv_1[:n] = np.linalg.solve(L, np.ones(n))
+        self._var_reduction = np.einsum("ij,ij->j", self._V[:n], self._V[:n])
+        self._n = n
+
+    def _kernel(self, A: np.ndarray, B: np.ndarray) -> np.ndarray:
+        dist2 = np.maximum((A ** 2).sum(1)[:, None] + (B ** 2).sum(1)[None, :] - 2.0 * A @ B.T, 0.0)
+        return np.exp(-0.5 * dist2 / self.length_scale ** 2)
+
+    def _learn_length_scale(self):
+        # 長さスケールを格子上で探し、対数周辺尤度が最大のものを選ぶ
+        indices = np.array([index for index, _ in self.history], dtype=np.int64)
+        y = np.array([value for _, value in self.history])
+        y = (y - y.mean()) / (y.std(ddof=1) or 1.0)
+        X = self._C[indices]
+        base = math.sqrt(X.shape[1])
+        best_scale, best_ll = self.length_scale, -np.inf
+        for scale in base * np.geomspace(0.05, 5.0, 15):
+            dist2 = np.maximum((X ** 2).sum(1)[:, None] + (X ** 2).sum(1)[None, :] - 2.0 * X @ X.T, 0.0)
+            K = np.exp(-0.5 * dist2 / scale ** 2) + self.noise_var * np.eye(len(X))
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            z = np.linalg.solve(L, y)
+            ll = -0.5 * float(z @ z) - float(np.log(np.diag(L)).sum())
+            if ll > best_ll:
+                best_scale, best_ll = scale, ll
+        return best_scale
+
+    def register(self, index: int, y: float):
+        """候補点 index の評価結果 y を追加する。"""
+        with self._lock:
+            self.pending.discard(index)
+            self.history.append((int(index), float(y)))
+            if self.learn_length_scale and len(self.history) >= self._next_refit:
+                # 観測点数が 2 倍になるごとに学習し直す（分解のやり直しは合計で O(n^3) 程度に収まる）
+                self._next_refit = 2 * len(self.history)
+                self.length_scale = self._learn_length_scale()
+                self._refactor()
+            else:
+                self._append(index, y)
+
+    def _y_stats(self) -> Tuple[float, float]:
+        y = np.array([value for _, value in self.history])
+        if len(y) < 2:
+            return (float(y.mean()) if len(y) else 0.0), 1.0
+        return float(y.mean()), float(y.std(ddof=1)) or 1.0
+
+    def predict(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        全候補点の予測平均と予測標準偏差を返す（目的関数の元の単位）。
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (平均, 標準偏差)
+        """
+        with self._lock:
+            mean_std, var_std = self._posterior()
+            mu, sigma = self._y_stats()
+        return mu + sigma * mean_std, sigma * np.sqrt(var_std)
+
+    def _posterior(self):
+        # 標準化した値での事後平均と分散
+        n = self._n
+        mu, sigma = self._y_stats()
+        beta = (self._Linv_y[:n] - mu * self._Linv_1[:n]) / sigma
+        mean = beta @ self._V[:n] if n else np.zeros(len(self._C))
+        var = np.maximum(1.0 - self._var_reduction, 1e-12)
+        return mean, var
+
+    def _score(self, mean: np.ndarray, var: np.ndarray) -> np.ndarray:
+        sd = np.sqrt(var)
+        if self.acquisition == "UCB":
+            return mean + self.ucb_kappa * sd
+        mu, sigma = self._y_stats()
+        best = (max(value for _, value in self.history) - mu) / sigma
+        improvement = mean - best - self.ei_xi
+        z = improvement / sd
+        return improvement * _norm_cdf(z) + sd * _norm_pdf(z)
+
+    def _fantasize(self, index: int, var: np.ndarray, fantasies: List[np.ndarray]) -> np.ndarray:
+        # index を予測平均で観測したとみなしたときの V の追加行（平均は変わらず分散だけが減る）
+        d = math.sqrt(var[index] + self.noise_var)
+        v = self._kernel_row(index) - self._V[:self._n, index] @ self._V[:self._n]
+        for row in fantasies:
+            v -= row[index] * row
+        v /= d
+        var -= v ** 2
+        np.maximum(var, 1e-12, out=var)
+        fantasies.append(v)
+        return v
+
+    def propose(self, q: int = 1) -> List[int]:
+        """
+        次に評価する候補点の番号を q 個提案する（提案した点は pending に入る）。
+
+        Returns:
+            List[int]: 候補点の番号
+        """
+        with self._lock:
+            excluded = np.zeros(len(self._C), dtype=bool)
+            excluded[[index for index, _ in self.history]] = True
+            excluded[list(self.pending)] = True
+            chosen: List[int] = []
+            if len(self.history) < self.n_initial:
+                # 最初はランダムに選ぶ
+                available = np.flatnonzero(~excluded)
+                n_random = min(q, self.n_initial - len(self.history), len(available))
+                chosen = [int(i) for i in self.rng.choice(available, n_random, replace=False)]
+                excluded[chosen] = True
+            if len(chosen) < q and self.history:
+                mean, var = self._posterior()
+                fantasies: List[np.ndarray] = []
+                for index in list(self.pending) + chosen:
+                    self._fantasize(index, var, fantasies)
+                while len(chosen) < q and not excluded.all():
+                    score = self._score(mean, var)
+                    score[excluded] = -np.inf
+                    index = int(np.argmax(score))
+                    chosen.append(index)
+                    excluded[index] = True
+                    if len(chosen) < q:
+                        self._fantasize(index, var, fantasies)
+            self.pending.update(chosen)
+            return chosen
+
+    def cancel(self, index: int):
+        """評価を取りやめた点を pending から外す。"""
+        with self._lock:
+            self.pending.discard(index)
+
+    def best(self) -> Optional[Dict[str, Any]]:
+        """これまでの最良の点を返す。"""
+        with self._lock:
+            if not self.history:
+                return None
+            index, value = max(self.history, key=lambda item: item[1])
+        return {"index": index, "x": self.candidates[index], "y": value}
+
+def run_batches(
+    optimizer: BayesianOptimizer,
+    objective: Callable[[np.ndarray], float],
+    n_evaluations: int,
+    batch_size: int = 4,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[int, np.ndarray, float]]:
+    """
+    目的関数を並列に評価しながら最適化を進め、評価結果を完了した順に返すジェネレーター。
+
+    最初に batch_size 点を提案して評価を始め、1 点終わるごとに結果を登録して次の 1 点を
+    提案します（常に batch_size 点を評価中に保つ）。途中で close するとまだ評価していない点は取り消します。
+
+    Parameters:
+        optimizer (BayesianOptimizer): 最適化器
+        objective (Callable[[np.ndarray], float]): 目的関数（プロセスプールでは pickle できること）
+        n_evaluations (int): 評価する点の数
+        batch_size (int): 同時に評価する点の数 (q)
+        executor (Optional[Executor]): 評価に使うプール（None ならプロセスプールを作成する）
+        max_workers (Optional[int]): executor を作成するときのワーカー数（None で batch_size）
+
+    Yields:
+        Tuple[int, np.ndarray, float]: (候補点の番号, 候補点, 目的関数の値)
+    """
+    pool = executor or ProcessPoolExecutor(max_workers=max_workers or batch_size)
+    running: Dict[Any, int] = {}
+    submitted = 0
+
+    def fill():
+        nonlocal submitted
+        n_new = min(batch_size - len(running), n_evaluations - submitted)
+        if n_new <= 0:
+            return
+        for index in optimizer.propose(n_new):
+            running[pool.submit(objective, optimizer.candidates[index])] = index
+            submitted += 1
+
+    try:
+        fill()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                y = future.result()
+                optimizer.register(index, y)
+                yield index, optimizer.candidates[index], y
+            fill()
+    finally:
+        for future, index in running.items():
+            future.cancel()
+            optimizer.cancel(index)
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+
+def demo_candidates(n: int = 100) -> np.ndarray:
+    """動作確認用の候補点（[-5, 10] × [0, 15] の n × n の格子）。"""
+    x1, x2 = np.meshgrid(np.linspace(-5, 10, n), np.linspace(0, 15, n))
+    return np.column_stack([x1.ravel(), x2.ravel()])
+
+def demo_objective(x: Sequence[float]) -> float:
+    """動作確認用の目的関数（Branin 関数の符号を反転したもの。最大値は約 -0.398）。"""
+    x1, x2 = x
+    a, b, c, r, s, t = 1.0, 5.1 / (4 * math.pi ** 2), 5 / math.pi, 6.0, 10.0, 1 / (8 * math.pi)
+    return -(a * (x2 - b * x1 ** 2 + c * x1 - r) ** 2 + s * (1 - t) * math.cos(x1) + s)
@@ -0,0 +1,68 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from agg import aggregate_transform, aggregate_transform_multi, geometric_mean
+
+GROUP_COLS = ['group1', 'group2']
+RANGE_KWARGS = dict(
+    target_col='value_to_aggregate',
+    x_col='feature_x',
+    y_col='feature_y',
+    x_range=(10, 30),
+    y_range=(5, 25),
+)
+
+def make_data(n_rows, n_groups, seed=0):
+    """ベンチマーク用の測定データを作る。"""
+    rng = np.random.default_rng(seed)
+    group = rng.integers(0, n_groups, n_rows)
+    return pd.DataFrame({
+        'group1': group // 100,
+        'group2': group % 100,
+        'feature_x': rng.uniform(0, 60, n_rows),
+        'feature_y': rng.uniform(0, 60, n_rows),
+        'value_to_aggregate': rng.uniform(0.5, 5.0, n_rows),
+    })
+
+def run_legacy(df):
+    """現行の aggregate_transform を 3 回呼ぶ（モジュールの使用例と同じ）。"""
+    return pd.DataFrame({
+        'geo_mean': aggregate_transform(df, geometric_mean, GROUP_COLS, **RANGE_KWARGS),
+        'arith_mean': aggregate_transform(df, np.mean, GROUP_COLS, **RANGE_KWARGS),
+        'max_value': aggregate_transform(df, np.max, GROUP_COLS, **RANGE_KWARGS),
+    })
+
+def run_multi(df):
+    return aggregate_transform_multi(
+        df,
+        {'geo_mean': 'geometric_mean', 'arith_mean': 'mean', 'max_value': 'max'},
+        GROUP_COLS,
+        **RANGE_KWARGS,
+    )
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="aggregate_transform と aggregate_transform_multi の比較")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6, 10**7])
+    parser.add_argument("--groups", type=int, default=1000, help="グループ数")
+    parser.add_argument("--legacy-max-rows", type=int, default=10**6,
+                        help="これより大きい行数では現行関数の計測を省略する")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy[s]':>10} {'multi[s]':>10} {'speedup':>8}")
+    for n_rows in args.sizes:
+        df = make_data(n_rows, args.groups)
+        multi_time, multi = timeit(run_multi, df)
+        if n_rows <= args.legacy_max_rows:
+            legacy_time, legacy = timeit(run_legacy, df)
+            pd.testing.assert_frame_equal(legacy, multi, check_dtype=False)
+            print(f"{n_rows:>10} {legacy_time:>10.3f} {multi_time:>10.3f} {legacy_time / multi_time:>7.1f}x")
+        else:
+            print(f"{n_rows:>10} {'-':>10} {multi_time:>10.3f} {'-':>8}")
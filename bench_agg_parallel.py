@@ -0,0 +1,45 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agg import aggregate_transform_multi
+from agg_parallel import aggregate_transform_parallel
+from bench_agg import GROUP_COLS, RANGE_KWARGS, make_data
+
+AGGS = {'geo_mean': 'geometric_mean', 'arith_mean': 'mean', 'max_value': 'max', 'std': 'std'}
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="aggregate_transform_parallel のワーカー数ごとの速度向上")
+    parser.add_argument("--rows", type=int, default=10**7)
+    parser.add_argument("--groups", type=int, default=10**5, help="グループ数")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3, help="各設定の計測回数（最小値を表示）")
+    args = parser.parse_args()
+
+    df = make_data(args.rows, args.groups)
+    base_time = min(timeit(aggregate_transform_multi, df, AGGS, GROUP_COLS, **RANGE_KWARGS)[0] for _ in range(args.repeat))
+    expected = aggregate_transform_multi(df, AGGS, GROUP_COLS, **RANGE_KWARGS)
+    print(f"cpu_count={os.cpu_count()} rows={args.rows} groups={args.groups}")
+    print(f"{'workers':>8} {'time[s]':>9} {'speedup':>8}")
+    print(f"{'multi':>8} {base_time:>9.3f} {1.0:>8.2f}")
+    for workers in args.workers:
+        # プールの起動時間は含めない（アプリではプールを使い回す想定）
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            times = []
+            for _ in range(args.repeat):
+                elapsed, result = timeit(
+                    aggregate_transform_parallel, df, AGGS, GROUP_COLS, **RANGE_KWARGS,
+                    max_workers=workers, executor=executor,
+                )
+                times.append(elapsed)
+        assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
+        print(f"{workers:>8} {min(times):>9.3f} {base_time / min(times):>8.2f}")
@@ -0,0 +1,69 @@
+import argparse
+import base64
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from bmp_base64 import CHUNK_SIZE, find_bmp_files, iter_encoded, iter_rows
+
+def write_bmp(path, width, height, bit_depth=24, seed=0):
+    """乱数のピクセルで無圧縮の BMP（下から上へ格納）を作る。"""
+    rng = np.random.default_rng(seed)
+    padded_row_size = (width * bit_depth + 31) // 32 * 4
+    pixels = rng.integers(0, 256, (height, padded_row_size), dtype=np.uint8)
+    offset = 14 + 40
+    with open(path, "wb") as f:
+        f.write(struct.pack("<2sIHHI", b"BM", offset + pixels.nbytes, 0, 0, offset))
+        f.write(struct.pack("<IiiHHIIiiII", 40, width, height, 1, bit_depth, 0, pixels.nbytes, 2835, 2835, 0, 0))
+        f.write(pixels.tobytes())
+
+def encode_pixels_per_row(path, chunk_size=CHUNK_SIZE):
+    # README の Power Query と同じ手順（1 行ずつ切り出して反転し、全体を base64 にしてから分割）
+    with open(path, "rb") as f:
+        data = f.read()
+    offset, = struct.unpack_from("<I", data, 10)
+    width, height = struct.unpack_from("<ii", data, 18)
+    bit_depth, = struct.unpack_from("<H", data, 28)
+    row_size = (width * bit_depth + 7) // 8
+    padded_row_size = (width * bit_depth + 31) // 32 * 4
+    rows = [data[offset + i * padded_row_size:offset + i * padded_row_size + row_size] for i in range(height)]
+    encoded = base64.b64encode(b"".join(reversed(rows))).decode("ascii")
+    return [encoded[i:i + chunk_size] for i in range(0, len(encoded), chunk_size)]
+
+def timeit(func, repeat=1):
+    # 1 回目はページキャッシュやメモリ確保の影響を受けるので、repeat 回の最小値を返す
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BMP の base64 チャンク化のスループット (MB/s)")
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--width", type=int, default=1921, help="行末にパディングが入るように奇数幅を既定にする")
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3, help="各設定の計測回数（最小値を表示）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.files):
+            write_bmp(os.path.join(tmp, f"image_{i:04d}.bmp"), args.width, args.height, seed=i)
+        files = find_bmp_files([tmp])
+        total_mb = sum(os.path.getsize(path) for path, _ in files) / 1024 ** 2
+        print(f"cpu_count={os.cpu_count()} files={args.files} size={args.width}x{args.height} total={total_mb:.1f} MB")
+        print(f"{'method':>16} {'time[s]':>9} {'MB/s':>8}")
+
+        elapsed, expected = timeit(lambda: [chunk for path, _ in files for chunk in encode_pixels_per_row(path)], args.repeat)
+        print(f"{'per-row':>16} {elapsed:>9.3f} {total_mb / elapsed:>8.1f}")
+        for mode in ("pixels", "file"):
+            for workers in args.workers:
+                elapsed, rows = timeit(lambda: list(iter_rows(iter_encoded(files, mode=mode, max_workers=workers))), args.repeat)
+                if mode == "pixels":
+                    assert [chunk for _, _, chunk in rows] == expected
+                print(f"{mode + ' x' + str(workers):>16} {elapsed:>9.3f} {total_mb / elapsed:>8.1f}")
@@ -0,0 +1,85 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+from d import Database
+
+def make_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(n_rows),
+        'group_id': rng.integers(0, 1000, n_rows),
+        'value': rng.uniform(0.5, 5.0, n_rows),
+    })
+
+class RoundTripCounter:
+    """エンジンのイベントで SQL 文の実行回数とコミット回数を数える。"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+def insert_per_row(db, rows):
+    for row in rows.itertuples(index=False):
+        db.insert("INSERT INTO measurements (id, group_id, value) VALUES (:id, :group_id, :value)",
+                  {'id': int(row.id), 'group_id': int(row.group_id), 'value': float(row.value)})
+
+def bulk_insert(db, rows):
+    db.bulk_insert('measurements', rows)
+
+def bulk_upsert(db, rows):
+    db.bulk_upsert('measurements', rows, conflict_cols=['id'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="insert と bulk_insert / bulk_upsert の比較")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--per-row-max", type=int, default=20000, help="1 行ずつの insert を計測する最大行数")
+    parser.add_argument("--url", help="計測する DB の URL（省略時は一時 SQLite）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if url is None:
+            db_path = os.path.join(directory, "bench.db")
+            url = f"sqlite:///{db_path}"
+        config_path = os.path.join(directory, "config.ini")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(f"[Database]\nurl = {url}\n")
+
+        db = Database(config_path)
+        counter = RoundTripCounter(db.engine)
+        rows = make_rows(args.rows)
+
+        cases = [("bulk_insert", bulk_insert), ("bulk_upsert", bulk_upsert)]
+        if args.rows <= args.per_row_max:
+            cases.insert(0, ("insert (per row)", insert_per_row))
+
+        print(f"{'method':>18} {'rows/s':>12} {'statements':>11} {'commits':>8}")
+        for name, func in cases:
+            db.execute("DROP TABLE IF EXISTS measurements")
+            db.execute("CREATE TABLE measurements (id BIGINT PRIMARY KEY, group_id BIGINT, value DOUBLE PRECISION)")
+            if name == "bulk_upsert":
+                bulk_insert(db, rows.iloc[: len(rows) // 2])  # 半分は更新、半分は挿入になる
+            counter.reset()
+            start = time.perf_counter()
+            func(db, rows)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>18} {len(rows) / elapsed:>12,.0f} {counter.statements:>11} {counter.commits:>8}")
+        db.engine.dispose()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from d import Database
+from db import export_query, load_columnar
+
+QUERY = "SELECT id, group_id, x, y, value, label FROM measurements"
+
+def make_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(n_rows),
+        'group_id': rng.integers(0, 1000, n_rows),
+        'x': rng.uniform(0, 60, n_rows),
+        'y': rng.uniform(0, 60, n_rows),
+        'value': rng.uniform(0.5, 5.0, n_rows),
+        'label': rng.choice(['a', 'b', 'c'], n_rows),
+    })
+
+def export_csv(db, path):
+    # COPY ... TO STDOUT WITH CSV HEADER と同じ内容を SQLite の代替で書き出す
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(db.iter_dataframe(QUERY, chunksize=65536)):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV と Parquet / Arrow IPC のエクスポート・読み込みの比較")
+    parser.add_argument("--rows", type=int, default=10**6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "config.ini")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(f"[Database]\nurl = sqlite:///{os.path.join(directory, 'bench.db')}\n")
+        db = Database(config_path)
+
+        db.execute("CREATE TABLE measurements (id BIGINT, group_id BIGINT, x REAL, y REAL, value REAL, label TEXT)")
+        db.bulk_insert('measurements', make_rows(args.rows))
+
+        print(f"{'format':>8} {'export[s]':>10} {'size[MB]':>9} {'load[s]':>8}")
+        for name in ("csv", "parquet", "arrow"):
+            path = os.path.join(directory, f"measurements.{name}")
+            if name == "csv":
+                export_time, _ = timeit(export_csv, db, path)
+                load_time, frame = timeit(pd.read_csv, path)
+            else:
+                export_time, _ = timeit(export_query, db.engine, QUERY, path, file_format=name)
+                load_time, frame = timeit(load_columnar, path)
+            assert len(frame) == args.rows
+            size_mb = os.path.getsize(path) / 1024 ** 2
+            print(f"{name:>8} {export_time:>10.3f} {size_mb:>9.1f} {load_time:>8.3f}")
+        db.engine.dispose()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from d import Database
+
+MODES = ("fetch_dataframe", "fetch_dataframe_columnar", "iter_dataframe")
+QUERY = "SELECT id, group_id, x, y, value FROM measurements"
+DTYPES = {"id": np.int64, "group_id": np.int64, "x": np.float64, "y": np.float64, "value": np.float64}
+
+def make_database(path, n_rows, seed=0):
+    """SQLite に PostgreSQL の代わりのベンチマーク用テーブルを作る。"""
+    rng = np.random.default_rng(seed)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE IF EXISTS measurements")
+        conn.execute("CREATE TABLE measurements (id INTEGER, group_id INTEGER, x REAL, y REAL, value REAL)")
+        rows = zip(
+            range(n_rows),
+            rng.integers(0, 1000, n_rows).tolist(),
+            rng.uniform(0, 60, n_rows).tolist(),
+            rng.uniform(0, 60, n_rows).tolist(),
+            rng.uniform(0.5, 5.0, n_rows).tolist(),
+        )
+        conn.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?, ?)", rows)
+
+def make_config(directory, db_path):
+    config_path = os.path.join(directory, "config.ini")
+    with open(config_path, "w", encoding="utf-8") as f:
+        f.write(f"[Database]\nurl = sqlite:///{db_path}\n")
+    return config_path
+
+def peak_rss_mb():
+    """プロセスの最大 RSS (MB)。ru_maxrss は fork 元の値を引き継ぐため Linux では VmHWM を使う。"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode, config_path, chunksize):
+    """1 つのモードを計測し、'行数 秒 最大RSS(MB) 取得による増分(MB)' を出力する（サブプロセスで実行）。"""
+    db = Database(config_path)
+    base_rss_mb = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "fetch_dataframe":
+        n_rows = len(db.fetch_dataframe(QUERY, chunksize=chunksize))
+    elif mode == "fetch_dataframe_columnar":
+        n_rows = len(db.fetch_dataframe_columnar(QUERY, chunksize=chunksize, dtypes=DTYPES))
+    else:
+        n_rows = sum(len(chunk) for chunk in db.iter_dataframe(QUERY, chunksize=chunksize, dtypes=DTYPES))
+    elapsed = time.perf_counter() - start
+    max_rss_mb = peak_rss_mb()
+    print(n_rows, elapsed, max_rss_mb, max_rss_mb - base_rss_mb)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fetch_dataframe の取得方式の比較（SQLite を代替に使用）")
+    parser.add_argument("--rows", type=int, default=10**6)
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run, args.config, args.chunksize)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        make_database(db_path, args.rows)
+        config_path = make_config(directory, db_path)
+
+        print(f"{'mode':>26} {'rows/s':>12} {'peak RSS[MB]':>13} {'delta[MB]':>10}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--run", mode, "--config", config_path, "--chunksize", str(args.chunksize)],
+                check=True, capture_output=True, text=True, cwd=directory,
+            ).stdout.strip().splitlines()[-1].split()  # echo = true の場合は SQL ログの後に結果が出力される
+            n_rows, elapsed, max_rss_mb, delta_mb = int(output[0]), float(output[1]), float(output[2]), float(output[3])
+            print(f"{mode:>26} {n_rows / elapsed:>12,.0f} {max_rss_mb:>13.1f} {delta_mb:>10.1f}")
@@ -0,0 +1,267 @@
+import argparse
+import base64
+import csv
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Power BI のテキスト列に入れられるように分割する文字数
+CHUNK_SIZE = 30000
+DATA_URI_PREFIX = "data:image/bmp;base64,"
+COLUMNS = ["Name", "Index", "Chunk"]
+
+# BITMAPFILEHEADER (14 バイト) と BITMAPINFOHEADER の先頭 (20 バイト)
+_FILE_HEADER = struct.Struct("<2sIHHI")
+_INFO_HEADER = struct.Struct("<IiiHHI")
+
+BmpHeader = namedtuple("BmpHeader", ["width", "height", "bit_depth", "offset", "compression"])
+
+def read_header(buffer) -> BmpHeader:
+    """
+    BMP のファイルヘッダーと情報ヘッダーを読む。
+
+    :param buffer: ファイルの内容（bytes / mmap など）
+    :return: BmpHeader（height が負の値なら上から下へ格納された画像）
+    """
+    if len(buffer) < _FILE_HEADER.size + _INFO_HEADER.size:
+        raise ValueError("BMP ファイルとして短すぎます")
+    signature, _, _, _, offset = _FILE_HEADER.unpack_from(buffer, 0)
+    if signature != b"BM":
+        raise ValueError("BMP ファイルではありません")
+    _, width, height, _, bit_depth, compression = _INFO_HEADER.unpack_from(buffer, _FILE_HEADER.size)
+    return BmpHeader(width, height, bit_depth, offset, compression)
+
+def pixel_bytes(buffer, header: Optional[BmpHeader] = None) -> bytes:
+    """
+    行末のパディングを除き、上の行から順に並べたピクセルデータを返す（README の Power Query と同じ処理）。
+
+    行の切り出しと上下反転は NumPy のストライド付きビューで行い、コピーは最後の 1 回だけです。
+
+    :param buffer: ファイルの内容（bytes / mmap など）
+    :param header: read_header の結果（省略時は読み直す）
+    :return: ピクセルデータ
+    """
+    header = header or read_header(buffer)
+    if header.compression not in (0, 3):  # BI_RGB / BI_BITFIELDS 以外（RLE 圧縮など）は行の長さが一定でない
+        raise ValueError(f"圧縮された BMP には対応していません (compression={header.compression})")
+    row_size = (header.width * header.bit_depth + 7) // 8
+    padded_row_size = (header.width * header.bit_depth + 31) // 32 * 4
+    n_rows = abs(header.height)
+    if header.offset + padded_row_size * (n_rows - 1) + row_size > len(buffer):
+        raise ValueError("ピクセルデータがファイルの終わりを超えています")
+    rows = np.ndarray((n_rows, row_size), dtype=np.uint8, buffer=buffer, offset=header.offset, strides=(padded_row_size, 1))
+    if header.height > 0:
+        rows = rows[::-1]  # 下から上へ格納されているので反転する
+    data = rows.tobytes()
+    del rows
+    return data
+
+def iter_base64_chunks(data, chunk_size: int = CHUNK_SIZE, prefix: str = "") -> Iterator[str]:
+    """
+    data を base64 エンコードしながら chunk_size 文字ずつ返す。
+
+    chunk_size が 4 の倍数なら、入力を chunk_size / 4 * 3 バイトずつ独立にエンコードするだけで
+    チャンクの境界がそろうため、エンコード済みの文字列全体をメモリに持ちません。
+
+    :param data: エンコードするデータ（bytes / memoryview / mmap）
+    :param chunk_size: 1 チャンクの文字数
+    :param prefix: 先頭に付ける文字列（"data:image/bmp;base64," など）
+    """
+    view = memoryview(data)
+    try:
+        if not prefix and chunk_size % 4 == 0:
+            step = chunk_size // 4 * 3
+            for start in range(0, len(view), step):
+                yield base64.b64encode(view[start:start + step]).decode("ascii")
+            return
+        carry = prefix
+        step = 3 * 65536
+        for start in range(0, len(view), step):
+            carry += base64.b64encode(view[start:start + step]).decode("ascii")
+            n_full = len(carry) // chunk_size * chunk_size
+            for offset in range(0, n_full, chunk_size):
+                yield carry[offset:offset + chunk_size]
+            carry = carry[n_full:]
+        if carry:
+            yield carry
+    finally:
+        view.release()
+
+def encode_file(path: str, name: str, chunk_size: int = CHUNK_SIZE, mode: str = "file", data_uri: bool = False) -> Tuple[str, List[str], int]:
+    """
+    BMP ファイル 1 つをメモリマップで読み、base64 のチャンクに分割する。
+
+    :param path: ファイルのパス
+    :param name: 出力する Name 列の値
+    :param chunk_size: 1 チャンクの文字数
+    :param mode: "file"（ファイル全体をエンコード）または "pixels"（パディングを除いて上下反転したピクセルデータ）
+    :param data_uri: True なら先頭に "data:image/bmp;base64," を付ける
+    :return: (Name, チャンクのリスト, 読み込んだバイト数)
+    """
+    prefix = DATA_URI_PREFIX if data_uri else ""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError(f"空のファイルです: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            header = read_header(buffer)
+            if mode == "pixels":
+                data = pixel_bytes(buffer, header)
+                chunks = list(iter_base64_chunks(data, chunk_size, prefix))
+            elif mode == "file":
+                chunks = list(iter_base64_chunks(buffer, chunk_size, prefix))
+            else:
+                raise ValueError(f"未対応のモードです: {mode}")
+    return name, chunks, size
+
+def find_bmp_files(paths: Sequence[str], recursive: bool = False) -> List[Tuple[str, str]]:
+    """
+    ファイルとディレクトリの指定から、(パス, Name) のリストを名前順に作る。
+
+    ディレクトリの場合は拡張子が .bmp のファイルを対象にし、Name はディレクトリからの相対パスにします。
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for file_name in sorted(names):
+                    if file_name.lower().endswith(".bmp"):
+                        full = os.path.join(root, file_name)
+                        files.append((full, os.path.relpath(full, path).replace(os.sep, "/")))
+                if not recursive:
+                    break
+        else:
+            files.append((path, os.path.basename(path)))
+    return files
+
+def iter_encoded(
+    files: Sequence[Tuple[str, str]],
+    chunk_size: int = CHUNK_SIZE,
+    mode: str = "file",
+    data_uri: bool = False,
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, List[str], int]]:
+    """
+    ファイルをプロセスプールで並列にエンコードし、files の順に結果を返す。
+
+    同時に処理中のファイルはワーカー数の 2 倍までに抑えるため、メモリ使用量はファイル数によりません。
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(files) <= 1:
+        for path, name in files:
+            yield encode_file(path, name, chunk_size, mode, data_uri)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        queued = iter(files)
+        for path, name in queued:
+            pending.append(executor.submit(encode_file, path, name, chunk_size, mode, data_uri))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for path, name in queued:
+                pending.append(executor.submit(encode_file, path, name, chunk_size, mode, data_uri))
+                break
+
+def iter_rows(encoded: Iterable[Tuple[str, List[str], int]]) -> Iterator[Tuple[str, int, str]]:
+    """エンコード結果を (Name, Index, Chunk) の行にする。"""
+    for name, chunks, _ in encoded:
+        for index, chunk in enumerate(chunks):
+            yield name, index, chunk
+
+def write_csv(rows: Iterable[Tuple[str, int, str]], output_file: str) -> int:
+    """(Name, Index, Chunk) の行をヘッダー付き CSV に書き出す。"""
+    count = 0
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def write_parquet(rows: Iterable[Tuple[str, int, str]], output_file: str, row_group_size: int = 1024) -> int:
+    """(Name, Index, Chunk) の行を row_group_size 行ずつの行グループで Parquet に書き出す。"""
+    from db import _import_pyarrow
+    pa = _import_pyarrow()
+    schema = pa.schema([("Name", pa.string()), ("Index", pa.int32()), ("Chunk", pa.string())])
+    count = 0
+    with pa.parquet.ParquetWriter(output_file, schema) as writer:
+        batch: List[Tuple[str, int, str]] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_arrays([list(column) for column in zip(*batch)], schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_arrays([list(column) for column in zip(*batch)], schema=schema))
+            count += len(batch)
+    return count
+
+def insert_rows(rows: Iterable[Tuple[str, int, str]], table: str, config_path: str = "config.ini", create_table: bool = False) -> int:
+    """(Name, Index, Chunk) の行を Database.bulk_insert でテーブルに挿入する。"""
+    from d import Database
+    db = Database(config_path)
+    if create_table:
+        quoted = db._quote_table(table)
+        db.execute(f'CREATE TABLE IF NOT EXISTS {quoted} ("Name" TEXT, "Index" INTEGER, "Chunk" TEXT)')
+    return db.bulk_insert(table, rows, columns=COLUMNS, batch_size=1000)
+
+class _Throughput:
+    # 読み込んだバイト数を数えながらエンコード結果をそのまま流す
+    def __init__(self, encoded):
+        self.encoded = encoded
+        self.files = 0
+        self.bytes = 0
+
+    def __iter__(self):
+        for name, chunks, size in self.encoded:
+            self.files += 1
+            self.bytes += size
+            yield name, chunks, size
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BMP 画像を base64 の (Name, Index, Chunk) 行に変換する（Power BI 用）")
+    parser.add_argument("inputs", nargs="+", help="BMP ファイルまたはディレクトリ")
+    parser.add_argument("-o", "--output", help="出力ファイル（.csv / .parquet）")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="出力形式（省略時は拡張子から判断）")
+    parser.add_argument("--table", help="出力ファイルの代わりに Database.bulk_insert で挿入するテーブル")
+    parser.add_argument("--config", default="config.ini", help="--table で使う設定ファイル")
+    parser.add_argument("--create-table", action="store_true", help="--table のテーブルがなければ作成する")
+    parser.add_argument("--mode", choices=["file", "pixels"], default="file",
+                        help="file: ファイル全体 / pixels: パディングを除き上下反転したピクセルデータ")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--data-uri", action="store_true", help='先頭に "data:image/bmp;base64," を付ける')
+    parser.add_argument("--recursive", action="store_true", help="ディレクトリを再帰的に探す")
+    parser.add_argument("--workers", type=int, default=None, help="並列に処理するプロセス数（省略時は CPU コア数）")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.table:
+        parser.error("--output か --table を指定してください")
+    files = find_bmp_files(args.inputs, args.recursive)
+    start = time.perf_counter()
+    counter = _Throughput(iter_encoded(files, args.chunk_size, args.mode, args.data_uri, args.workers))
+    rows = iter_rows(counter)
+    if args.table:
+        n_rows = insert_rows(rows, args.table, args.config, args.create_table)
+    elif (args.format or os.path.splitext(args.output)[1].lstrip(".").lower()) == "parquet":
+        n_rows = write_parquet(rows, args.output)
+    else:
+        n_rows = write_csv(rows, args.output)
+    elapsed = time.perf_counter() - start
+    mb = counter.bytes / 1024 ** 2
+    print(f"{counter.files} files, {n_rows} chunks, {mb:.1f} MB in {elapsed:.2f} s ({mb / max(elapsed, 1e-9):.1f} MB/s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
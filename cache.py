@@ -0,0 +1,272 @@
+import hashlib
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+import pandas as pd
+
+# 読み取りクエリが参照するテーブル（FROM / JOIN の直後の識別子）
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+((?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*))?)', re.IGNORECASE)
+# 更新系クエリが書き込むテーブル
+_WRITE_TABLES = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|MERGE\s+INTO|COPY|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)'
+    r'\s+((?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*))?)',
+    re.IGNORECASE,
+)
+
+def normalize_sql(sql: str) -> str:
+    """空白の違いを無視できるように、連続する空白を 1 つにまとめる。"""
+    return " ".join(sql.split())
+
+def table_key(name: str) -> str:
+    """スキーマ修飾やクォートの有無によらず比較できるテーブル名（小文字・スキーマなし）。"""
+    return name.split(".")[-1].strip('"').lower()
+
+def tables_in(sql: str, write: bool = False) -> Set[str]:
+    """
+    SQL が参照（write=True なら更新）するテーブル名の集合を返す。
+
+    簡易的な字句解析のため、判別できない場合は空集合になります。
+    """
+    pattern = _WRITE_TABLES if write else _READ_TABLES
+    return {table_key(name) for name in pattern.findall(sql)}
+
+def _sizeof_row(row: Any) -> int:
+    size = sys.getsizeof(row)
+    if isinstance(row, (str, bytes)) or not hasattr(row, "__iter__"):
+        return size
+    return size + sum(sys.getsizeof(cell) for cell in row)
+
+def _sizeof(value: Any) -> int:
+    # 大きさの見積もり（pickle で測るとクエリと同じくらい時間がかかるため、構造から概算する）
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return sys.getsizeof(value)
+        # 行数が多い場合は最大 1000 行を等間隔に抜き出して 1 行あたりの大きさを求める
+        sample = value[::max(len(value) // 1000, 1)]
+        per_row = sum(_sizeof_row(row) for row in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_row * len(value))
+    return _sizeof_row(value)
+
+def _copy(value: Any) -> Any:
+    # 行（Row）は変更できないので、リスト自体を浅くコピーすれば十分
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+class _Entry:
+    __slots__ = ("value", "path", "size", "expires", "tables")
+
+    def __init__(self, value, path, size, expires, tables):
+        self.value = value
+        self.path = path
+        self.size = size
+        self.expires = expires
+        self.tables = tables
+
+class QueryCache:
+    """
+    Database の読み取り結果をキャッシュする LRU キャッシュ。
+
+    キーは正規化した SQL・バインドパラメーター・取得方法 (fetch_all など) の組です。
+    メモリ上の合計サイズが max_bytes を超えると古い順に追い出し、disk_dir を指定した場合は
+    追い出したエントリ（および max_bytes より大きい結果）を pickle ファイルとしてディスクに
+    退避します。エントリは ttl 秒で失効し、更新系のクエリが参照テーブルに書き込むと無効化されます。
+
+    使用例:
+        cache = QueryCache(max_bytes=256 * 1024 ** 2, ttl=600, disk_dir=".query_cache")
+        db = Database(cache=cache)
+        db.fetch_dataframe("SELECT * FROM your_table")  # 2 回目以降はキャッシュから返す
+        print(cache.stats())
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 ** 2,
+        ttl: Optional[float] = 600.0,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 4 * 1024 ** 3
+    ):
+        """
+        Parameters:
+            max_bytes (int): メモリ上に保持する結果の合計サイズ（バイト）
+            ttl (Optional[float]): エントリの有効期間（秒）。None で無期限
+            disk_dir (Optional[str]): ディスク退避先のディレクトリ。None でディスクを使わない
+            max_disk_bytes (int): ディスク上に保持する結果の合計サイズ（バイト）
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._table_generations: Dict[str, int] = {}  # テーブル名 -> 無効化した回数
+        self._clear_generation = 0  # clear した回数
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(kind: str, sql: str, params: Optional[Dict[str, Any]]) -> tuple:
+        """取得方法・正規化した SQL・パラメーターからキャッシュキーを作る。"""
+        if params is None:
+            bound = ()
+        elif isinstance(params, dict):
+            bound = tuple(sorted((name, repr(value)) for name, value in params.items()))
+        else:
+            bound = (repr(params),)
+        return (kind, normalize_sql(sql), bound)
+
+    def get_or_load(self, kind: str, sql: str, params: Optional[Dict[str, Any]], load: Callable[[], Any]) -> Any:
+        """
+        キャッシュにあればその値を、なければ load() の結果を保存して返す。
+
+        DataFrame と行のリストは、呼び出し側の変更がキャッシュに影響しないようにコピーを返します。
+        """
+        key = self.make_key(kind, sql, params)
+        found, value = self._get(key)
+        if not found:
+            tables = tables_in(sql)
+            # 読み込み中に無効化されたら、無効化前の内容かもしれない結果は保存しない
+            generation = self._generation(tables)
+            value = load()
+            self._put(key, value, tables, generation)
+        return _copy(value)
+
+    def _generation(self, tables: Set[str]) -> tuple:
+        with self._lock:
+            return (self._clear_generation, tuple(self._table_generations.get(table, 0) for table in sorted(tables)))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            if entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            if entry.path is None:
+                self._counters["hits"] += 1
+                return True, entry.value
+            path = entry.path
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self._counters["misses"] += 1
+            return False, None
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        return True, value
+
+    def _put(self, key, value, tables, generation=None):
+        size = _sizeof(value)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(value, None, size, expires, tables)
+            self._entries[key] = entry
+            if size > self.max_bytes:
+                self._spill(key, entry)
+            else:
+                self._memory_bytes += size
+            self._evict()
+
+    def _spill(self, key, entry):
+        # メモリから追い出すエントリをディスクに退避する（ディスクが無効なら削除）
+        if not self.disk_dir or entry.size > self.max_disk_bytes:
+            del self._entries[key]
+            return
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pkl"
+        path = os.path.join(self.disk_dir, name)
+        with open(path, "wb") as f:
+            pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        entry.value = None
+        entry.path = path
+        self._disk_bytes += entry.size
+
+    def _evict(self):
+        # 古い順に、メモリ上のエントリはディスクへ、ディスク上のエントリは削除する
+        for key in list(self._entries):
+            if self._memory_bytes <= self.max_bytes and self._disk_bytes <= self.max_disk_bytes:
+                break
+            entry = self._entries[key]
+            if entry.path is None and self._memory_bytes > self.max_bytes:
+                self._memory_bytes -= entry.size
+                self._counters["evictions"] += 1
+                self._spill(key, entry)
+            elif entry.path is not None and self._disk_bytes > self.max_disk_bytes:
+                self._remove(key)
+                self._counters["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        if entry.path is None:
+            self._memory_bytes -= entry.size
+        else:
+            self._disk_bytes -= entry.size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        """指定したテーブルを参照するエントリを削除する。"""
+        names = {table_key(table) for table in tables}
+        with self._lock:
+            for name in names:
+                self._table_generations[name] = self._table_generations.get(name, 0) + 1
+            for key in [k for k, entry in self._entries.items() if entry.tables & names]:
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    def invalidate_sql(self, sql: str):
+        """
+        更新系の SQL が書き込むテーブルを参照するエントリを削除する。
+
+        書き込み先のテーブルを判別できない SQL（関数呼び出しなど）の場合はすべて削除します。
+        """
+        tables = tables_in(sql, write=True)
+        if tables:
+            self.invalidate_tables(tables)
+        else:
+            self.clear()
+
+    def clear(self):
+        """すべてのエントリを削除する。"""
+        with self._lock:
+            self._clear_generation += 1
+            for key in list(self._entries):
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミス・追い出し・失効・無効化の回数と、現在のエントリ数・サイズを返す。"""
+        with self._lock:
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                memory_bytes=self._memory_bytes,
+                disk_bytes=self._disk_bytes,
+            )
@@ -1,16 +1,62 @@
 import configparser
+import io
 import os
+import threading
+import uuid
+from contextlib import contextmanager
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import ResultProxy
-from typing import List, Callable, Any
+from typing import List, Callable, Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+import numpy as np
 import pandas as pd
 import logging
+import time
+from cache import QueryCache
+from metrics import QueryStats
 
-class Database:
-    def __init__(self, config_path='config.ini'):
-        self.config = self.read_config(config_path)
-        self.engine = self.create_engine()
-        self.setup_logging()
+# プロセス内で共有するエンジン（接続先とプール設定ごとに 1 つ）と、その実行統計
+_engines = {}
+_engine_stats = {}
+_engines_lock = threading.Lock()
+
+# config.ini の [Database] から読むプール設定と型
+POOL_OPTIONS = {
+    'pool_size': int,
+    'max_overflow': int,
+    'pool_timeout': float,
+    'pool_recycle': int,
+    'pool_pre_ping': bool,
+}
+
+def get_engine(connection_string, **options):
+    # 同じ接続先・設定のエンジンは作り直さずに再利用する
+    key = (connection_string, tuple(sorted(options.items())))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(connection_string, **options)
+            _engines[key] = engine
+        return engine
+
+def get_stats(engine, **options):
+    # エンジンごとに 1 つの QueryStats を登録して返す（2 回目以降の options は無視）
+    with _engines_lock:
+        stats = _engine_stats.get(engine)
+        if stats is None:
+            stats = QueryStats(**options).attach(engine)
+            _engine_stats[engine] = stats
+        return stats
+
+def dispose_engines():
+    # 登録済みのエンジンとプール内の接続をすべて破棄する（fork 後やテスト終了時など）
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _engine_stats.clear()
+
+class ConfigMixin:
+    # config.ini の [Database] セクションの読み取り（Database と AsyncDatabase で共通）
 
     def read_config(self, file_path):
         if not os.path.exists(file_path):
@@ -29,48 +75,225 @@ class Database:
             return password
         return self.config['Database']['password']
 
-    def create_engine(self):
+    def get_pool_options(self):
+        # 指定のない項目は SQLAlchemy の既定値（pool_pre_ping のみ既定で有効）
+        section = self.config['Database']
+        options = {'pool_pre_ping': True}
+        for name, type_ in POOL_OPTIONS.items():
+            if not section.get(name, '').strip():
+                continue
+            if type_ is bool:
+                options[name] = section.getboolean(name)
+            elif type_ is int:
+                options[name] = section.getint(name)
+            else:
+                options[name] = section.getfloat(name)
+        return options
+
+    def get_connection_string(self, driver='psycopg2'):
+        # url が指定されていればそのまま使う（SQLite などの代替 DB 用）
+        if self.config['Database'].get('url', '').strip():
+            return self.config['Database']['url']
         db_host = self.config['Database']['host']
         db_port = self.config.getint('Database', 'port')
         db_user = self.config['Database']['user']
         db_password = self.get_password()
         db_name = self.config['Database']['database']
-        connection_string = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-        return create_engine(connection_string, echo=True)
+        return f"postgresql+{driver}://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+    def get_echo(self):
+        # すべての SQL をログに出すのは echo = true のときだけ（負荷が大きいため既定では無効）
+        return self.config['Database'].getboolean('echo', fallback=False)
+
+    def get_stats_options(self):
+        # slow_query_ms が空欄なら遅いクエリのログを出さない
+        section = self.config['Database']
+        slow_query_ms = section.get('slow_query_ms', '500').strip()
+        return {
+            'slow_query_ms': float(slow_query_ms) if slow_query_ms else None,
+            'sample_rate': section.getfloat('stats_sample_rate', fallback=1.0),
+        }
 
     def setup_logging(self):
         logging.basicConfig(filename='sqlalchemy.log', level=logging.INFO)
-        logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+        logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO if self.get_echo() else logging.WARNING)
+
+class Database(ConfigMixin):
+    def __init__(self, config_path='config.ini', cache: Optional[QueryCache] = None):
+        self.config = self.read_config(config_path)
+        self.engine = self.create_engine()
+        self.stats = get_stats(self.engine, **self.get_stats_options())
+        self.setup_logging()
+        self._local = threading.local()  # transaction() 中の接続（スレッドごと）
+        self.cache = cache  # 読み取り結果のキャッシュ（None で無効）
+
+    def create_engine(self):
+        return get_engine(self.get_connection_string(), echo=self.get_echo(), **self.get_pool_options())
+
+    @contextmanager
+    def transaction(self):
+        # ブロック内の fetch_*/execute などを 1 つの接続・トランザクションで実行する
+        # 正常終了でコミット、例外でロールバック（入れ子の場合は外側にまとめる）
+        if getattr(self._local, 'connection', None) is not None:
+            yield self
+            return
+        self._local.written = []
+        try:
+            with self._checkout() as connection, connection.begin():
+                self._local.connection = connection
+                try:
+                    yield self
+                finally:
+                    self._local.connection = None
+        finally:
+            # コミット前に他のスレッドが古い結果をキャッシュした可能性があるため、もう一度無効化する
+            written, self._local.written = self._local.written, []
+            for sql, tables in written:
+                self._invalidate(sql, tables)
+
+    @contextmanager
+    def connect(self):
+        # transaction() 中ならその接続を使い、それ以外はプールから借りて返す
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        with self._checkout() as connection:
+            yield connection
+
+    def _checkout(self):
+        # プールから接続を借りるまでの時間を記録する
+        start = time.perf_counter()
+        connection = self.engine.connect()
+        self.stats.record_pool_wait(time.perf_counter() - start)
+        return connection
+
+    def _in_transaction(self):
+        return getattr(self._local, 'connection', None) is not None
+
+    def _cached(self, kind, query, params, load):
+        # キャッシュが有効で、トランザクション外（未コミットの変更が見えない）ときだけキャッシュを使う
+        if self.cache is None or self._in_transaction():
+            return load()
+        return self.cache.get_or_load(kind, query, params, load)
+
+    def _invalidate(self, sql=None, tables=None):
+        # 更新したテーブルを参照するキャッシュを無効化する
+        if self.cache is None:
+            return
+        if self._in_transaction():
+            self._local.written.append((sql, tables))
+        if tables is not None:
+            self.cache.invalidate_tables(tables)
+        else:
+            self.cache.invalidate_sql(sql)
 
     def fetch_all(self, query, params=None):
-        with self.engine.connect() as connection:
-            result = connection.execute(text(query), params)
-            return result.fetchall()
+        def load():
+            with self.connect() as connection:
+                rows = connection.execute(text(query), params).fetchall()
+            self.stats.record_fetch(query, len(rows))
+            return rows
+        return self._cached('fetch_all', query, params, load)
 
     def fetch_one(self, query, params=None):
-        with self.engine.connect() as connection:
-            result = connection.execute(text(query), params)
-            return result.fetchone()
+        def load():
+            with self.connect() as connection:
+                row = connection.execute(text(query), params).fetchone()
+            self.stats.record_fetch(query, 0 if row is None else 1)
+            return row
+        return self._cached('fetch_one', query, params, load)
 
     def fetch_dataframe(self, query, params=None, chunksize=1000):
-        with self.engine.connect() as connection:
-            result = connection.execute(text(query), params)
-            chunks = []
-            while True:
-                chunk = result.fetchmany(chunksize)
-                if not chunk:
-                    break
-                df_chunk = pd.DataFrame(chunk, columns=result.keys())
-                chunks.append(df_chunk)
-            return pd.concat(chunks, ignore_index=True)
+        def load():
+            with self.connect() as connection:
+                result = connection.execute(text(query), params)
+                chunks = []
+                while True:
+                    chunk = result.fetchmany(chunksize)
+                    if not chunk:
+                        break
+                    df_chunk = pd.DataFrame(chunk, columns=result.keys())
+                    chunks.append(df_chunk)
+                # 結果が 0 行でも列名だけの DataFrame を返す
+                df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(result.keys()))
+            self._record_frame(query, df)
+            return df
+        return self._cached('fetch_dataframe', query, params, load)
+
+    def _stream(self, connection, query, params, chunksize):
+        # サーバーサイドカーソル（psycopg2 の名前付きカーソル）で結果を chunksize 行ずつ受け取る
+        options = {'stream_results': True, 'max_row_buffer': chunksize}
+        return connection.execute(text(query), params, execution_options=options)
+
+    def iter_dataframe(self, query, params=None, chunksize=10000, dtypes: Optional[Dict[str, Any]] = None) -> Iterator[pd.DataFrame]:
+        # chunksize 行ごとの DataFrame を順に返す（全件をメモリに載せない）
+        # ジェネレーターを最後まで読むか close するまで接続を保持する
+        dtypes = dtypes or {}
+        with self.connect() as connection:
+            result = self._stream(connection, query, params, chunksize)
+            columns = list(result.keys())
+            for rows in result.partitions(chunksize):
+                data = {}
+                for name, values in zip(columns, zip(*rows)):
+                    data[name] = np.array(values, dtype=dtypes.get(name, object))
+                frame = pd.DataFrame(data, columns=columns, copy=False).infer_objects()
+                self._record_frame(query, frame)
+                yield frame
+
+    def fetch_dataframe_columnar(self, query, params=None, chunksize=10000, dtypes: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        # 列ごとに確保した NumPy 配列へ直接書き込んで 1 つの DataFrame を作る
+        # dtypes（列名 -> dtype）を指定した列は object 列を経由しない（NULL を含む列は float を指定する）
+        dtypes = dtypes or {}
+        kind = f"fetch_dataframe_columnar:{sorted((name, str(np.dtype(dtype))) for name, dtype in dtypes.items())}"
+        return self._cached(kind, query, params, lambda: self._fetch_columnar(query, params, chunksize, dtypes))
+
+    def _fetch_columnar(self, query, params, chunksize, dtypes):
+        with self.connect() as connection:
+            result = self._stream(connection, query, params, chunksize)
+            columns = list(result.keys())
+            buffers = [np.empty(chunksize, dtype=dtypes.get(name, object)) for name in columns]
+            size = 0
+            for rows in result.partitions(chunksize):
+                n = len(rows)
+                if size + n > len(buffers[0]):
+                    capacity = max(2 * len(buffers[0]), size + n)
+                    buffers = [self._grow(buffer, size, capacity) for buffer in buffers]
+                for buffer, values in zip(buffers, zip(*rows)):
+                    if buffer.dtype == object:
+                        buffer[size:size + n] = values
+                    else:
+                        buffer[size:size + n] = np.array(values, dtype=buffer.dtype)
+                size += n
+        # 倍々に確保した余りを結果と一緒に保持し続けないよう、容量が余っている列は切り詰めてコピーする
+        # （1 列ずつ元のバッファを手放して、ピークのメモリを抑える）
+        for i, buffer in enumerate(buffers):
+            if size < len(buffer):
+                buffers[i] = buffer[:size].copy()
+        buffer = None
+        data = {name: buffer for name, buffer in zip(columns, buffers)}
+        frame = pd.DataFrame(data, columns=columns, copy=False).infer_objects()
+        self._record_frame(query, frame)
+        return frame
+
+    def _record_frame(self, query, frame):
+        self.stats.record_fetch(query, len(frame), int(frame.memory_usage(index=False).sum()))
+
+    @staticmethod
+    def _grow(buffer, size, capacity):
+        grown = np.empty(capacity, dtype=buffer.dtype)
+        grown[:size] = buffer[:size]
+        return grown
 
     def execute(self, query, params=None, confirm_delete=False):
         if "DELETE" in query.upper() and not confirm_delete:
             raise PermissionError("DELETEクエリを実行するにはconfirm_delete=Trueを指定してください。")
-        with self.engine.connect() as connection:
+        with self.connect() as connection:
             result = connection.execute(text(query), params)
-            connection.commit()
-            return result.rowcount
+            if not self._in_transaction():
+                connection.commit()
+        self._invalidate(sql=query)
+        return result.rowcount
 
     def insert(self, query, params=None):
         return self.execute(query, params)
@@ -83,12 +306,160 @@ class Database:
 
     def query(self, sql: str, params: dict, create_entity: Callable[[ResultProxy], Any]) -> List[Any]:
         result = []
-        with self.engine.connect() as connection:
+        with self.connect() as connection:
             result_proxy = connection.execute(text(sql), params)
             for row in result_proxy:
                 result.append(create_entity(row))
         return result
 
+    def _quote_table(self, table):
+        # スキーマ修飾（schema.table）にも対応して識別子をクォートする
+        preparer = self.engine.dialect.identifier_preparer
+        return ".".join(preparer.quote(part) for part in table.split("."))
+
+    def _quote_columns(self, columns):
+        preparer = self.engine.dialect.identifier_preparer
+        return ", ".join(preparer.quote(column) for column in columns)
+
+    @staticmethod
+    def _iter_batches(rows, columns, batch_size):
+        # DataFrame / dict の iterable / tuple の iterable を batch_size 行ごとの DataFrame にそろえる
+        if isinstance(rows, pd.DataFrame):
+            frame = rows if columns is None else rows[list(columns)]
+            columns = list(frame.columns)
+
+            def batches():
+                for start in range(0, len(frame), batch_size):
+                    yield frame.iloc[start:start + batch_size]
+            return columns, batches()
+
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return list(columns or []), iter(())
+        if columns is None:
+            if not isinstance(first, dict):
+                raise ValueError("tuple の行を渡す場合は columns を指定してください")
+            columns = list(first.keys())
+        columns = list(columns)
+
+        def batches():
+            batch = [first]
+            for row in iterator:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield pd.DataFrame.from_records(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+        return columns, batches()
+
+    @staticmethod
+    def _to_params(batch, names):
+        # NaN/NaT を None にし、ドライバが扱える Python の値で executemany 用の辞書を作る
+        values = batch.astype(object).where(batch.notna(), None)
+        return [dict(zip(names, row)) for row in values.itertuples(index=False, name=None)]
+
+    @staticmethod
+    def _copy_from(connection, sql, batches):
+        # COPY ... FROM STDIN に CSV を流し込む（psycopg2 / psycopg 3 の両方に対応）
+        cursor = connection.connection.cursor()
+        chunks = (batch.to_csv(header=False, index=False, na_rep='\\N') for batch in batches)
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, _ChunkReader(chunks))
+        else:
+            with cursor.copy(sql) as copy:
+                for chunk in chunks:
+                    copy.write(chunk)
+        return cursor.rowcount
+
+    def bulk_insert(self, table: str, rows: Union[pd.DataFrame, Iterable[Any]], columns: Optional[Sequence[str]] = None, batch_size=10000) -> int:
+        # 複数行をまとめて挿入し、最後に 1 回だけコミットする
+        # PostgreSQL は COPY FROM STDIN、その他は batch_size 行ごとの executemany
+        columns, batches = self._iter_batches(rows, columns, batch_size)
+        if not columns:
+            return 0
+        target = f"{self._quote_table(table)} ({self._quote_columns(columns)})"
+        with self.transaction(), self.connect() as connection:
+            self._invalidate(tables=[table])
+            if self.engine.dialect.name == 'postgresql':
+                sql = f"COPY {target} FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+                return self._copy_from(connection, sql, batches)
+            names = [f"p{i}" for i in range(len(columns))]
+            statement = text(f"INSERT INTO {target} VALUES ({', '.join(':' + name for name in names)})")
+            count = 0
+            for batch in batches:
+                count += connection.execute(statement, self._to_params(batch, names)).rowcount
+            return count
+
+    def bulk_upsert(self, table: str, rows: Union[pd.DataFrame, Iterable[Any]], conflict_cols: Sequence[str], columns: Optional[Sequence[str]] = None, batch_size=10000) -> int:
+        # conflict_cols が一致する行は更新、それ以外は挿入する（INSERT ... ON CONFLICT）
+        # PostgreSQL は一時テーブルへ COPY してから 1 文でマージ（同じキーは後の行を優先）、
+        # その他（SQLite など ON CONFLICT 構文を持つ DB）は executemany
+        columns, batches = self._iter_batches(rows, columns, batch_size)
+        if not columns:
+            return 0
+        update_cols = [column for column in columns if column not in conflict_cols]
+        preparer = self.engine.dialect.identifier_preparer
+        if update_cols:
+            action = "DO UPDATE SET " + ", ".join(f"{preparer.quote(c)} = EXCLUDED.{preparer.quote(c)}" for c in update_cols)
+        else:
+            action = "DO NOTHING"
+        column_list = self._quote_columns(columns)
+        conflict_list = self._quote_columns(conflict_cols)
+        target = self._quote_table(table)
+
+        with self.transaction(), self.connect() as connection:
+            self._invalidate(tables=[table])
+            if self.engine.dialect.name == 'postgresql':
+                staging = preparer.quote(f"_staging_{uuid.uuid4().hex[:12]}")
+                ordinal = preparer.quote(f"_ordinal_{uuid.uuid4().hex[:12]}")
+                connection.exec_driver_sql(f"CREATE TEMP TABLE {staging} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP")
+                # ctid は挿入順を保証しないため、COPY の入力順に採番する列で後の行を判定する
+                connection.exec_driver_sql(f"ALTER TABLE {staging} ADD COLUMN {ordinal} bigserial")
+                self._copy_from(connection, f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", batches)
+                merge = (
+                    f"INSERT INTO {target} ({column_list}) "
+                    f"SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {staging} "
+                    f"ORDER BY {conflict_list}, {ordinal} DESC "
+                    f"ON CONFLICT ({conflict_list}) {action}"
+                )
+                return connection.exec_driver_sql(merge).rowcount
+            names = [f"p{i}" for i in range(len(columns))]
+            statement = text(
+                f"INSERT INTO {target} ({column_list}) VALUES ({', '.join(':' + name for name in names)}) "
+                f"ON CONFLICT ({conflict_list}) {action}"
+            )
+            count = 0
+            for batch in batches:
+                count += connection.execute(statement, self._to_params(batch, names)).rowcount
+            return count
+
+class _ChunkReader(io.TextIOBase):
+    # 文字列チャンクのイテレーターを copy_expert が読めるファイル風オブジェクトにする
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ""
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer[self._position:] + "".join(self._chunks)
+            self._buffer, self._position = "", 0
+            return data
+        while len(self._buffer) - self._position < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._position:] + chunk
+            self._position = 0
+        data = self._buffer[self._position:self._position + size]
+        self._position += len(data)
+        return data
+
 # 使用例
 if __name__ == "__main__":
     db = Database()
@@ -1,3 +1,11 @@
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import text
+
 def export_table_to_csv(engine, table_name, output_dir="output"):
     """
     指定したテーブルをCSVにエクスポートする。
@@ -15,6 +23,18 @@ def export_table_to_csv(engine, table_name, output_dir="output"):
 
     print(f"Exported {table_name} to {output_file}")
 
+def list_tables(engine, schema="public"):
+    """
+    スキーマ内のテーブル名の一覧を返す。
+
+    :param engine: SQLAlchemyのエンジン
+    :param schema: 対象のスキーマ名
+    :return: テーブル名のリスト
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = :schema"), {"schema": schema})
+        return [row[0] for row in result]
+
 def export_all_tables_to_csv(engine, output_dir="output"):
     """
     データベース内のすべてのテーブルをCSVにエクスポートする。
@@ -22,30 +42,375 @@ def export_all_tables_to_csv(engine, output_dir="output"):
     :param engine: SQLAlchemyのエンジン
     :param output_dir: CSVの保存先ディレクトリ
     """
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public'"))
-        tables = [row[0] for row in result]
-
-    for table in tables:
+    for table in list_tables(engine):
         export_table_to_csv(engine, table, output_dir)
 
     print("All tables exported successfully.")
 
+def copy_to(conn, sql, write):
+    """
+    COPY ... TO STDOUT の出力を受け取ったブロックごとに write に渡す。
 
+    psycopg 3 (cursor.copy) と psycopg2 (copy_expert) のどちらのドライバでも動作する。
 
-with engine.connect() as conn:
-    with open("output.csv", "wb") as f:
-        cur = conn.connection.cursor()
-        with cur.copy("COPY upsert.main_table TO STDOUT WITH CSV HEADER") as copy:
-            for data in copy:
-                f.write(data)
-
-query = """SELECT *
-        FROM upsert.main_table
-        """
-with engine.connect() as conn:
-    with open("output.csv", "wb") as f:
-        cur = conn.connection.cursor()
-        with cur.copy("COPY ({}) TO STDOUT WITH CSV HEADER".format(query)) as copy:
+    :param conn: SQLAlchemyの接続
+    :param sql: COPY ... TO STDOUT 文
+    :param write: bytes を受け取る関数
+    """
+    cur = conn.connection.cursor()
+    if hasattr(cur, "copy_expert"):
+        cur.copy_expert(sql, _Writer(write))
+    else:
+        with cur.copy(sql) as copy:
             for data in copy:
-                f.write(data)
\ No newline at end of file
+                write(bytes(data))
+
+class _Writer:
+    # copy_expert が書き込むファイル風オブジェクト（str/bytes どちらも bytes にして渡す）
+    def __init__(self, write):
+        self._write = write
+
+    def write(self, data):
+        self._write(data.encode("utf-8") if isinstance(data, str) else bytes(data))
+        return len(data)
+
+def _open_compressed(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd 圧縮には zstandard パッケージが必要です: pip install zstandard") from e
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    if compression is None:
+        return open(path, "wb")
+    raise ValueError(f"未対応の圧縮形式です: {compression}")
+
+_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", None: ""}
+
+class _PartWriter:
+    """
+    COPY の出力を圧縮しながらファイルに書き、part_size バイト（非圧縮）ごとに次のファイルへ切り替える。
+
+    COPY のデータはブロック（行）単位で届くため、ブロックの途中では分割しない。
+    各パートの先頭には CSV のヘッダー行を付ける。書き込み中は .tmp 付きの名前で作成し、
+    commit() で最終的なファイル名に変更する。
+    """
+
+    def __init__(self, output_dir, table_name, compression, part_size):
+        self.output_dir = output_dir
+        self.table_name = table_name
+        self.compression = compression
+        self.part_size = part_size
+        self.paths = []
+        self.rows_bytes = 0
+        self._header = None
+        self._file = None
+        self._written = 0
+
+    def _path(self, index):
+        suffix = f".part{index:04d}" if self.part_size else ""
+        return os.path.join(self.output_dir, f"{self.table_name}{suffix}.csv{_EXTENSIONS[self.compression]}")
+
+    def _next_part(self):
+        if self._file is not None:
+            self._file.close()
+        path = self._path(len(self.paths) + 1)
+        self.paths.append(path)
+        self._file = _open_compressed(path + ".tmp", self.compression)
+        self._written = 0
+        if self._header is not None:
+            self._file.write(self._header)
+            self._written += len(self._header)
+
+    def write(self, data):
+        if self._header is None:
+            self._header = data  # 最初のブロックは HEADER 行
+            self._next_part()
+            return
+        if self.part_size and self._written >= self.part_size:
+            self._next_part()
+        self._file.write(data)
+        self._written += len(data)
+        self.rows_bytes += len(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def commit(self):
+        self.close()
+        for path in self.paths:
+            os.replace(path + ".tmp", path)
+        return [os.path.basename(path) for path in self.paths]
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(path, manifest):
+    # 書き込み途中で中断しても壊れないよう一時ファイルから置き換える
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _export_table(engine, table_name, output_dir, compression, part_size):
+    writer = _PartWriter(output_dir, table_name, compression, part_size)
+    try:
+        with engine.connect() as conn:
+            copy_to(conn, f"COPY {table_name} TO STDOUT WITH CSV HEADER", writer.write)
+    finally:
+        writer.close()
+    files = writer.commit()
+    return {"status": "done", "files": files, "bytes": writer.rows_bytes}
+
+def export_tables_parallel(engine, tables=None, output_dir="output", max_workers=4,
+                           compression="gzip", part_size=None, manifest_name="manifest.json"):
+    """
+    複数のテーブルを並列に COPY TO STDOUT でエクスポートし、圧縮しながら書き出す。
+
+    出力ディレクトリのマニフェストに完了したテーブルを記録するため、中断後に再実行すると
+    完了済みのテーブルは読み飛ばされる。失敗したテーブルはマニフェストに記録され、
+    すべてのテーブルを処理した後に RuntimeError を送出する。
+
+    :param engine: SQLAlchemyのエンジン（プールの接続数は max_workers 以上にする）
+    :param tables: エクスポートするテーブル名のリスト（省略時は public スキーマの全テーブル）
+    :param output_dir: 保存先ディレクトリ
+    :param max_workers: 同時にエクスポートするテーブル数
+    :param compression: "gzip"、"zstd"（zstandard パッケージが必要）または None
+    :param part_size: 1 ファイルあたりの非圧縮バイト数の目安（None で分割しない）
+    :param manifest_name: マニフェストのファイル名
+    :return: マニフェスト（テーブル名ごとの状態・ファイル名・バイト数）
+    """
+    if compression not in _EXTENSIONS:
+        raise ValueError(f"未対応の圧縮形式です: {compression}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, manifest_name)
+    manifest = _load_manifest(manifest_path)
+    lock = threading.Lock()
+
+    if tables is None:
+        tables = list_tables(engine)
+    pending = [t for t in tables if manifest["tables"].get(t, {}).get("status") != "done"]
+    for table in sorted(set(tables) - set(pending)):
+        print(f"Skipped {table} (already exported)")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_export_table, engine, table, output_dir, compression, part_size): table
+            for table in pending
+        }
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                entry = future.result()
+                print(f"Exported {table} to {', '.join(entry['files'])}")
+            except Exception as e:
+                entry = {"status": "failed", "error": str(e)}
+                failed.append(table)
+                print(f"Failed to export {table}: {e}")
+            with lock:
+                manifest["tables"][table] = entry
+                _save_manifest(manifest_path, manifest)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} 個のテーブルのエクスポートに失敗しました: {', '.join(failed)}")
+    print("All tables exported successfully.")
+    return manifest
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet / Arrow IPC 形式には pyarrow パッケージが必要です: pip install pyarrow") from e
+    return pyarrow
+
+_COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+def export_query(engine, query, output_file, file_format="parquet", params=None, batch_size=65536, schema=None):
+    """
+    クエリ結果をサーバーサイドカーソルで読み、Parquet または Arrow IPC ファイルに書き出す。
+
+    batch_size 行ごとに列単位の RecordBatch を作り、Parquet では 1 つの行グループとして
+    書き込むため、メモリ使用量は batch_size で決まる。CSV と違い列の型が保持される。
+
+    :param engine: SQLAlchemyのエンジン
+    :param query: SELECT 文
+    :param output_file: 出力ファイルのパス
+    :param file_format: "parquet" または "arrow"（Arrow IPC ファイル形式）
+    :param params: クエリのパラメーター
+    :param batch_size: 1 バッチ（行グループ）あたりの行数
+    :param schema: pyarrow.Schema（省略時は最初のバッチから推定。すべて NULL の列はカーソルの型情報、判別できなければ文字列にする）
+    :return: 書き出した行数
+    """
+    if file_format not in _COLUMNAR_FORMATS:
+        raise ValueError(f"未対応のファイル形式です: {file_format}")
+    pa = _import_pyarrow()
+    n_rows = 0
+    writer = None
+    stringify = set()  # 型が決まらず文字列にした列の番号（値を str にしてから変換する）
+    try:
+        with engine.connect() as conn:
+            options = {"stream_results": True, "max_row_buffer": batch_size}
+            result = conn.execute(text(query), params, execution_options=options)
+            columns = list(result.keys())
+            for rows in result.partitions(batch_size):
+                n_rows += len(rows)
+                values_by_column = list(zip(*rows))
+                if schema is None:
+                    # 最初のバッチから推定し、すべて NULL の列はカーソルの型情報、なければ文字列にする
+                    # （後のバッチを待つとその間の結果をすべてメモリに持つことになる）
+                    arrays = [pa.array(values) for values in values_by_column]
+                    fields = []
+                    for i, (name, array) in enumerate(zip(columns, arrays)):
+                        data_type = array.type
+                        if pa.types.is_null(data_type):
+                            data_type = _description_type(pa, result.cursor.description, i)
+                            if data_type is None:
+                                data_type = pa.string()
+                                stringify.add(i)
+                        fields.append(pa.field(name, data_type))
+                    schema = pa.schema(fields)
+                arrays = [
+                    pa.array([None if v is None else str(v) for v in values] if i in stringify else values, type=field.type)
+                    for i, (values, field) in enumerate(zip(values_by_column, schema))
+                ]
+                batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+                if writer is None:
+                    writer = _open_columnar_writer(pa, output_file, file_format, schema)
+                _write_columnar(writer, batch, file_format, batch_size)
+            if writer is None:
+                # 結果が 0 行でも列名だけのファイルを作る
+                if schema is None:
+                    description = result.cursor.description if result.cursor is not None else None
+                    schema = pa.schema([
+                        (name, _description_type(pa, description, i) or pa.null()) for i, name in enumerate(columns)
+                    ])
+                writer = _open_columnar_writer(pa, output_file, file_format, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+# PostgreSQL (psycopg2) の cursor.description の type_code（型 OID）から Arrow の型への対応
+_PG_OID_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32", 700: "float32", 701: "float64",
+    25: "string", 1042: "string", 1043: "string", 1082: "date32", 1114: "timestamp", 1184: "timestamp_tz",
+}
+
+def _description_type(pa, description, index):
+    # 型を判別できなければ None（SQLite などは type_code を持たない）
+    if not description or index >= len(description):
+        return None
+    name = _PG_OID_TYPES.get(description[index][1]) if isinstance(description[index][1], int) else None
+    if name == "timestamp":
+        return pa.timestamp("us")
+    if name == "timestamp_tz":
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, name)() if name else None
+
+def _open_columnar_writer(pa, output_file, file_format, schema):
+    if file_format == "parquet":
+        return pa.parquet.ParquetWriter(output_file, schema)
+    return pa.ipc.new_file(output_file, schema)
+
+def _write_columnar(writer, batch, file_format, batch_size):
+    if file_format == "parquet":
+        writer.write_batch(batch, row_group_size=batch_size)
+    else:
+        writer.write_batch(batch)
+
+def export_table_to_columnar(engine, table_name, output_dir="output", file_format="parquet", batch_size=65536):
+    """
+    指定したテーブルを Parquet または Arrow IPC 形式でエクスポートする。
+
+    :param engine: SQLAlchemyのエンジン
+    :param table_name: エクスポートするテーブル名
+    :param output_dir: 保存先ディレクトリ
+    :param file_format: "parquet" または "arrow"
+    :param batch_size: 1 バッチ（行グループ）あたりの行数
+    """
+    if file_format not in _COLUMNAR_FORMATS:
+        raise ValueError(f"未対応のファイル形式です: {file_format}")
+    os.makedirs(output_dir, exist_ok=True)  # 出力ディレクトリを作成
+    output_file = os.path.join(output_dir, f"{table_name}{_COLUMNAR_FORMATS[file_format]}")
+    export_query(engine, f"SELECT * FROM {table_name}", output_file, file_format, batch_size=batch_size)
+
+    print(f"Exported {table_name} to {output_file}")
+
+def load_columnar(path, columns=None):
+    """
+    export_query / export_table_to_columnar で書き出したファイルを DataFrame として読み込む。
+
+    ファイルはメモリマップで開き、テキストの解析は行わない（Arrow IPC はゼロコピーで読める）。
+    形式は拡張子 (.parquet / .arrow) で判別する。
+
+    :param path: ファイルのパス
+    :param columns: 読み込む列名のリスト（省略時はすべて）
+    :return: pandas.DataFrame
+    """
+    pa = _import_pyarrow()
+    if path.endswith(".parquet"):
+        table = pa.parquet.read_table(path, columns=columns, memory_map=True)
+    else:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    return table.to_pandas()
+
+def iter_columnar(path, columns=None):
+    """
+    load_columnar のバッチ版。行グループ（Arrow IPC はレコードバッチ）ごとの DataFrame を順に返す。
+
+    agg.StreamingAggregator や UnbiasedStandardScaler.partial_fit に渡してメモリに収まらない
+    ファイルを処理するためのもの。
+
+    :param path: ファイルのパス
+    :param columns: 読み込む列名のリスト（省略時はすべて）
+    """
+    pa = _import_pyarrow()
+    if path.endswith(".parquet"):
+        parquet_file = pa.parquet.ParquetFile(path, memory_map=True)
+        for i in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+    else:
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch.to_pandas()
+
+if __name__ == "__main__":
+    from d import Database
+
+    engine = Database().engine
+
+    with engine.connect() as conn:
+        with open("output.csv", "wb") as f:
+            cur = conn.connection.cursor()
+            with cur.copy("COPY upsert.main_table TO STDOUT WITH CSV HEADER") as copy:
+                for data in copy:
+                    f.write(data)
+
+    query = """SELECT *
+            FROM upsert.main_table
+            """
+    with engine.connect() as conn:
+        with open("output.csv", "wb") as f:
+            cur = conn.connection.cursor()
+            with cur.copy("COPY ({}) TO STDOUT WITH CSV HEADER".format(query)) as copy:
+                for data in copy:
+                    f.write(data)
+
+    # 全テーブルを並列・gzip 圧縮でエクスポート（中断後の再実行では完了済みを読み飛ばす）
+    export_tables_parallel(engine, output_dir="output", max_workers=4, compression="gzip", part_size=512 * 1024 * 1024)
@@ -0,0 +1,101 @@
+import tkinter as tk
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+class DynamicContainer:
+    """
+    作成済みのウィンドウの Column / Frame に、ウィンドウを作り直さずに要素を追加・削除・非表示にするクラス。
+
+    追加する行ごとに専用の tk.Frame（ホルダー）を作り、その中にだけ Window._create_widget で
+    ウィジェットを作成します。ほかの要素は作り直さないため、追加のコストはレイアウト全体の
+    大きさによらず、テーブルのデータやスクロール位置もそのまま残ります。
+
+    使用例:
+        inputs = eg.Column([[eg.Input(key="-input1-")]], key="-inputs-")
+        win = eg.Window("...", [[tbl, inputs]])
+        container = DynamicContainer(win, inputs)
+        container.add([eg.Input(key="-input2-")])
+        container.hide("-input2-")
+    """
+
+    def __init__(self, window, container):
+        """
+        Parameters:
+            window (eg.Window): 作成済みのウィンドウ
+            container (eg.Column | eg.Frame): 要素を追加する先のコンテナ要素
+        """
+        self.window = window
+        # スクロール可能な Frame などは子要素を container_parent に置く
+        self.parent: tk.Widget = container.container_parent or container.widget
+        self._rows: "OrderedDict[Any, tk.Frame]" = OrderedDict()
+        self._elements: Dict[Any, List[Any]] = {}
+        self._hidden: set = set()
+        self._count = 0
+
+    def add(self, row: List[Any], key: Any = None) -> Any:
+        """
+        1 行分の要素をコンテナの末尾に追加する。
+
+        Parameters:
+            row (List[eg.Element]): 追加する要素のリスト（横に並べる）
+            key: 行を識別するキー。省略時は先頭の要素のキー（なければ連番）
+
+        Returns:
+            行のキー（remove / hide / show に渡す）
+        """
+        if key is None:
+            key = next((elem.key for elem in row if elem.key), None)
+        if key is None:
+            key = f"-dynamic-row{self._count}-"
+        if key in self._rows:
+            raise KeyError(f"行のキーが重複しています: {key}")
+        self._count += 1
+        holder = tk.Frame(self.parent, background=self.parent.cget("background"))
+        self.window._create_widget(holder, [row])
+        holder.pack(side="top", fill="x", anchor="n")
+        self._rows[key] = holder
+        self._elements[key] = list(row)
+        return key
+
+    def remove(self, key: Any):
+        """行を削除し、その要素をウィンドウのキー一覧 (values) からも外す。"""
+        holder = self._rows.pop(key)
+        for elem in self._elements.pop(key):
+            if elem.key is not None and self.window.key_elements.get(elem.key) is elem:
+                del self.window.key_elements[elem.key]
+        self._hidden.discard(key)
+        holder.destroy()
+
+    def hide(self, key: Any):
+        """行を非表示にする（要素と値は残る）。"""
+        if key not in self._hidden:
+            self._rows[key].pack_forget()
+            self._hidden.add(key)
+
+    def show(self, key: Any):
+        """非表示にした行を元の位置に戻す。"""
+        if key not in self._hidden:
+            return
+        self._hidden.discard(key)
+        # 後ろにある表示中の行の前に入れて、追加した順序を保つ
+        after = self._next_visible(key)
+        if after is None:
+            self._rows[key].pack(side="top", fill="x", anchor="n")
+        else:
+            self._rows[key].pack(side="top", fill="x", anchor="n", before=after)
+
+    def _next_visible(self, key: Any) -> Optional[tk.Frame]:
+        keys = list(self._rows)
+        for other in keys[keys.index(key) + 1:]:
+            if other not in self._hidden:
+                return self._rows[other]
+        return None
+
+    def keys(self) -> List[Any]:
+        return list(self._rows)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
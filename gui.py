@@ -1,24 +1,78 @@
+import contextlib
+import itertools
+import logging
+import os
+import weakref
+
 import TkEasyGUI as eg
-import tkinter as tk
+import pandas as pd
+
+from agg import aggregate_transform_multi
+from bayesopt import BayesianOptimizer, demo_candidates, demo_objective, run_batches
+from dynamic_layout import DynamicContainer
+from gui_profiler import EventLoopProfiler
+from tasks import TASK_CANCELLED, TASK_DONE, TASK_ERROR, TASK_PROGRESS, TaskRunner
+from virtual_table import DataFrameSource, VirtualTable
+from widget_registry import WidgetRegistry
+
+logger = logging.getLogger(__name__)
+
+class SampleSource:
+    # "@行x列" の文字列を並べたサンプルデータ（要求された行の分だけ文字列を作る）
+    def __init__(self, n_rows=100, n_cols=30):
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.headings = [f"@000x{col:03}" for col in range(n_cols)]
+
+    def __len__(self):
+        return self.n_rows - 1
+
+    def rows(self, start, stop):
+        return [[f"@{row:03}x{col:03}" for col in range(self.n_cols)] for row in range(start + 1, stop + 1)]
+
+def fetch_dataframe_with_progress(db, query, params=None, chunksize=10000, context=None):
+    # チャンクごとに取得行数を報告し、キャンセルされたらそこで止める
+    chunks = []
+    with contextlib.closing(db.iter_dataframe(query, params, chunksize=chunksize)) as frames:
+        for frame in frames:
+            chunks.append(frame)
+            if context is not None:
+                context.progress(sum(len(chunk) for chunk in chunks))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+def run_optimization(optimizer, objective, n_evaluations, batch_size, context=None):
+    # 目的関数はプロセスプールで batch_size 点ずつ並列に評価し、1 点終わるごとに件数を報告する
+    with contextlib.closing(run_batches(optimizer, objective, n_evaluations, batch_size)) as results:
+        for count, _ in enumerate(results, 1):
+            if context is not None:
+                context.progress(count)
+    return optimizer.best()
 
 class BayesianOptimizationApp:
-    def __init__(self):
+    # source には DataFrameSource / ArraySource / QuerySource などを渡す（省略時はサンプルデータ）
+    # profile=True でイベントループの計測を有効にする（F12 で gui_profile.json に書き出す）
+    # objective / candidates は最適化する目的関数と候補点（省略時はデモ用の関数と格子）
+    def __init__(self, source=None, profile=False, objective=None, candidates=None):
+        self.source = source if source is not None else SampleSource()
+        self.objective = objective if objective is not None else demo_objective
+        self.candidates = candidates if candidates is not None else demo_candidates()
+        self.optimizer = None
+        self.n_shown = 0  # テーブルに表示済みの評価結果の数
+        self.profiler = EventLoopProfiler(enabled=profile)
+        # DB の取得はスレッド、集計などの CPU 処理はプロセスで実行する
+        self.tasks = TaskRunner(max_workers=4)
+        self.cpu_tasks = None
+        self._data_tokens = {}  # id(df) -> (弱参照, トークン)
+        self._token_counter = itertools.count()
         self.create_widgets()
 
     def create_widgets(self):
-        self.data = []
-        for row in range(100):
-            rows = []
-            for col in range(30):
-                rows.append(f"@{row:03}x{col:03}")
-            self.data.append(rows)
-
         common_font = ("Arial", 12)
 
         self.tbl = eg.Table(
             key="-table-",
-            values=self.data[1:],  # テーブルに表示するデータ(ヘッダ行を含まない)を指定
-            headings=self.data[0],  # ヘッダ行を指定
+            values=[],  # 行は VirtualTable が表示範囲の分だけ作る
+            headings=self.source.headings,  # ヘッダ行を指定
             expand_x=True,  # ウィンドウのX方向にサイズを合わせる
             expand_y=True,  # ウィンドウのY方向にサイズを合わせる
             justification="center",  # セルを中央揃えにする
@@ -31,72 +85,196 @@ class BayesianOptimizationApp:
         self.textBox = [eg.Input("input1", key="-input1-", enable_events=True, color="red", font=common_font)]
 
         tab1_layout = [
-            [self.tbl, self.textBox[0]],
-            [eg.Button("Update", expand_x=True, font=common_font), eg.Button("Close", font=common_font)]
+            [self.tbl, eg.Column([[self.textBox[0]]], key="-inputs-")],
+            [eg.Button("Update", expand_x=True, font=common_font), eg.Button("Cancel", font=common_font), eg.Button("Close", font=common_font)],
+            [eg.Text("", key="-status-", expand_x=True, font=common_font)]
         ]
 
         tab2_layout = [
             [eg.Text("This is Tab 2", font=common_font)],
             [eg.Button("Close", font=common_font)],
             [eg.Button("Disable Tab 1", key="-DISABLE_TAB1-", font=common_font)],
-            [eg.Button("Enable Tab 1", key="-ENABLE_TAB1-", font=common_font)]
+            [eg.Button("Enable Tab 1", key="-ENABLE_TAB1-", font=common_font)],
+            [eg.Text("バッチサイズ (q)", font=common_font), eg.Input("4", key="-BO-BATCH-", font=common_font)],
+            [eg.Text("評価回数", font=common_font), eg.Input("200", key="-BO-EVALS-", font=common_font)],
+            [eg.Text("獲得関数", font=common_font), eg.Combo(["EI", "UCB"], default_value="EI", key="-BO-ACQ-", font=common_font)],
+            [eg.Button("最適化を開始", key="-BO-START-", font=common_font), eg.Button("最適化を停止", key="-BO-STOP-", font=common_font)]
         ]
 
         self.layout = [[eg.TabGroup([[eg.Tab("あああ1", tab1_layout, key="-TAB1-"), eg.Tab("[Preset]最適化パラメーター", tab2_layout, key="-TAB2-")]], font=common_font)]]
         # create window
         self.win = eg.Window("Table test", self.layout, font=common_font, resizable=True, size=(800, 600))
-
+        self.vtable = VirtualTable(self.tbl, self.source)
+        self.profiler.instrument(self.vtable, "refresh", "flush", prefix="table")
+        if self.profiler.enabled:
+            self.win.window.bind("<F12>", lambda e: self.win.post_event("-PROFILE-DUMP-", {}))
+        # 入力欄はこのコンテナに追加する（ウィンドウは作り直さない）
+        self.inputs = DynamicContainer(self.win, self.win["-inputs-"])
+        # 状態を切り替えるウィジェットをタブごとに索引する（入力欄は -TAB1- の子グループ）
+        self.widgets = WidgetRegistry()
+        self.widgets.add_group("-inputs-", parent="-TAB1-")
+        self.widgets.index("-inputs-", self.win["-inputs-"])
+        self.widgets.index("-TAB1-", self.win["-TAB1-"])
+        self.widgets.index("-TAB2-", self.win["-TAB2-"])
 
     def run(self):
         while True:
-            event, values = self.win.read()
-            print("@@@", event, values)
-            if event == eg.WIN_CLOSED:
-                break
-            if event == "Close":
-                break
-            if event == "Update":
-                print("Update")
-                self.add_textbox()
-            if event == "-DISABLE_TAB1-":
-                self.set_tab_state("-TAB1-", "disabled")
-            if event == "-ENABLE_TAB1-":
-                self.set_tab_state("-TAB1-", "normal")
+            # タイムアウト付きで読み、その間に完了したタスクの結果をイベントとして受け取る
+            event, values = self.profiler.read(self.win, timeout=50)
+            with self.profiler.handle(event):
+                if not self.handle_event(event, values):
+                    break
 
+        self.tasks.shutdown()
+        if self.cpu_tasks is not None:
+            self.cpu_tasks.shutdown()
         self.win.close()
 
+    def handle_event(self, event, values):
+        # イベントを処理する（ウィンドウを閉じるときは False を返す）
+        if event == "-TIMEOUT-":
+            self.tasks.dispatch(self.win)
+            if self.cpu_tasks is not None:
+                self.cpu_tasks.dispatch(self.win)
+            return True
+        logger.debug("event: %s", event)
+        if event == eg.WIN_CLOSED:
+            return False
+        if event == "Close":
+            return False
+        if event == "Update":
+            self.add_textbox()
+        if event == "Cancel":
+            self.cancel_tasks()
+        if event == "-DISABLE_TAB1-":
+            self.set_tab_state("-TAB1-", "disabled")
+        if event == "-ENABLE_TAB1-":
+            self.set_tab_state("-TAB1-", "normal")
+        if event in (TASK_PROGRESS, TASK_DONE, TASK_ERROR, TASK_CANCELLED):
+            self.handle_task_event(event, values)
+        if event == "-BO-START-":
+            batch_size = self.read_positive_int(values, "-BO-BATCH-", "バッチサイズ")
+            n_evaluations = self.read_positive_int(values, "-BO-EVALS-", "評価回数")
+            if batch_size is not None and n_evaluations is not None:
+                self.start_optimization(batch_size, n_evaluations, values["-BO-ACQ-"])
+        if event == "-BO-STOP-":
+            self.tasks.cancel("optimize")
+        if event == "-PROFILE-DUMP-":
+            self.profiler.dump("gui_profile.json")
+            logger.info("gui_profile.json に書き出しました\n%s", self.profiler.summary().head(20).to_string())
+        return True
+
+    def load_query(self, db, query, params=None):
+        # クエリの結果をバックグラウンドで取得し、完了したらテーブルに表示する
+        # 同じクエリが取得中なら新しく実行しない
+        key = ("query", query, repr(params))
+        self.tasks.submit(key, fetch_dataframe_with_progress, db, query, params, with_context=True)
+        return key
+
+    def run_aggregation(self, df, aggs, group_cols, target_col, x_col, y_col, x_range, y_range):
+        # 集計はプロセスプールで実行する（GIL を持ったままの pandas の処理で UI を止めない）
+        if self.cpu_tasks is None:
+            self.cpu_tasks = TaskRunner(use_processes=True)
+        # ワーカーには必要な列だけを渡す。キーは内容をハッシュせず（UI スレッドで全行を読まない）、
+        # DataFrame ごとに払い出すトークンにする（id(df) は GC 後に別の DataFrame で再利用される）
+        columns = list(dict.fromkeys([*group_cols, target_col, *(c for c in (x_col, y_col) if c is not None)]))
+        data = df[columns]
+        key = (
+            "aggregate", self._data_token(df), repr(aggs), tuple(group_cols), target_col, x_col, y_col,
+            None if x_range is None else tuple(x_range), None if y_range is None else tuple(y_range),
+        )
+        self.cpu_tasks.submit(key, aggregate_transform_multi, data, aggs, group_cols, target_col, x_col, y_col, x_range, y_range)
+        return key
+
+    def _data_token(self, df):
+        # 同じ DataFrame には同じトークンを返す（破棄されたら登録を消すので、再利用された id と混同しない）
+        # 同じ DataFrame をその場で変更した場合は、新しい DataFrame を渡して集計し直す
+        entry = self._data_tokens.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        token = next(self._token_counter)
+        ref = weakref.ref(df, lambda _, i=id(df), t=token: self._forget_token(i, t))
+        self._data_tokens[id(df)] = (ref, token)
+        return token
+
+    def _forget_token(self, object_id, token):
+        entry = self._data_tokens.get(object_id)
+        if entry is not None and entry[1] == token:
+            del self._data_tokens[object_id]
+
+    def update_cells(self, patches):
+        # {(行, 列): 値} の変更をテーブルに反映する（変更は 1 フレーム分まとめて、変わったセルだけ描画する）
+        self.vtable.update_cells(patches)
+
+    def update_rows(self, rows):
+        # {行: 行の値} の変更を反映する（現在の行数以上の行は末尾に追加する）
+        self.vtable.update_rows(rows)
+
+    def cancel_tasks(self):
+        for runner in (self.tasks, self.cpu_tasks):
+            if runner is not None:
+                runner.cancel_all()
+
+    def read_positive_int(self, values, key, label):
+        # 入力欄の値を正の整数として読む（読めなければステータスに表示して None を返す）
+        text = str(values.get(key, "")).strip()
+        try:
+            value = int(text)
+        except ValueError:
+            value = 0
+        if value < 1:
+            self.win["-status-"].update(f"{label}には 1 以上の整数を入力してください: {text!r}")
+            return None
+        return value
+
+    def start_optimization(self, batch_size, n_evaluations, acquisition="EI"):
+        # 結果を表示する空のテーブルに切り替え、最適化をバックグラウンドで開始する
+        if self.tasks.running("optimize"):
+            return
+        self.optimizer = BayesianOptimizer(self.candidates, acquisition=acquisition)
+        headings = [f"x{i}" for i in range(self.candidates.shape[1])] + ["y"]
+        self.vtable.set_source(DataFrameSource(pd.DataFrame(columns=headings)))
+        self.n_shown = 0
+        self.tasks.submit("optimize", run_optimization, self.optimizer, self.objective, n_evaluations, batch_size, with_context=True)
+
+    def show_optimization_results(self):
+        # まだ表示していない評価結果をテーブルの末尾に追加する
+        history = self.optimizer.history[self.n_shown:]
+        rows = {}
+        for row, (index, y) in enumerate(history, start=len(self.vtable)):
+            rows[row] = list(self.candidates[index]) + [y]
+        self.vtable.update_rows(rows)
+        self.n_shown += len(history)
+
+    def handle_task_event(self, event, values):
+        name = values["key"][0] if isinstance(values["key"], tuple) else values["key"]
+        if name == "optimize" and event in (TASK_PROGRESS, TASK_DONE, TASK_CANCELLED):
+            self.show_optimization_results()
+        if event == TASK_PROGRESS:
+            self.win["-status-"].update(f"{name}: {values['progress']:,} 件")
+        elif event == TASK_DONE:
+            result = values["result"]
+            if isinstance(result, pd.DataFrame):
+                self.vtable.set_source(DataFrameSource(result))
+            if name == "optimize" and result is not None:
+                self.win["-status-"].update(f"{name}: 完了 (最良値 {result['y']:.6g})")
+            else:
+                self.win["-status-"].update(f"{name}: 完了")
+        elif event == TASK_ERROR:
+            self.win["-status-"].update(f"{name}: エラー {values['error']}")
+        elif event == TASK_CANCELLED:
+            self.win["-status-"].update(f"{name}: キャンセル")
+
     def add_textbox(self):
         new_textbox = eg.Input("", key=f"-input{len(self.textBox) + 1}-", enable_events=True, color="red", font=("Arial", 12))
         self.textBox.append(new_textbox)
-        self.win.close()
-        tab1_layout = [
-            [self.tbl, self.textBox[0]],
-            [eg.Button("Update", expand_x=True, font=("Arial", 12)), eg.Button("Close", font=("Arial", 12))]
-        ]
-        tab2_layout = [
-            [eg.Text("This is Tab 2", font=("Arial", 12))],
-            [eg.Button("Close", font=("Arial", 12))],
-            [eg.Button("Disable Tab 1", key="-DISABLE_TAB1-", font=("Arial", 12))],
-            [eg.Button("Enable Tab 1", key="-ENABLE_TAB1-", font=("Arial", 12))]
-        ]
-        self.layout = [[eg.TabGroup([[eg.Tab("Tab 1", tab1_layout, key="-TAB1-"), eg.Tab("Tab 2", tab2_layout, key="-TAB2-")]], font=("Arial", 12))]]
-        self.win = eg.Window("Table test", self.layout, font=("Arial", 12), resizable=True, size=(800, 600))
-
-        # 上揃えにするための設定
-        for element in self.win.element_list():
-            if isinstance(element.Widget, tk.Widget):
-                element.Widget.pack_configure(anchor='n')
+        self.inputs.add([new_textbox])
+        self.widgets.register("-inputs-", new_textbox)
 
     def set_tab_state(self, tab_key, state):
-        def recursive_set_state(widget):
-            for element in widget.winfo_children():
-                print(type(element))
-                if isinstance(element, (tk.Button, tk.Entry)):
-                    element.configure(state=state)
-                recursive_set_state(element)
-
-        recursive_set_state(self.win[tab_key].Widget)
+        self.widgets.set_state(tab_key, state)
 
 if __name__ == "__main__":
-    app = BayesianOptimizationApp()
+    # GUI_PROFILE=1 で計測を有効にする
+    app = BayesianOptimizationApp(profile=os.environ.get("GUI_PROFILE") == "1")
     app.run()
\ No newline at end of file
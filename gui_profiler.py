@@ -0,0 +1,187 @@
+import contextlib
+import functools
+import json
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_NULL = contextlib.nullcontext()
+TIMEOUT_EVENT = "-TIMEOUT-"
+
+def count_widgets(widget) -> int:
+    """widget 以下の tk ウィジェットの数を数える。"""
+    stack = [widget]
+    count = 0
+    while stack:
+        w = stack.pop()
+        count += 1
+        stack.extend(w.winfo_children())
+    return count
+
+class EventLoopProfiler:
+    """
+    GUI のイベントループの計測を行うクラス（enabled=False のときは何もしない）。
+
+    win.read の待ち時間、イベントごとのハンドラーの処理時間、instrument で登録した
+    メソッド（テーブルの再描画など）の所要時間を、最大 capacity 件のリングバッファに記録します。
+    通常のイベントは sample_rate の割合だけ記録し、slow_ms を超えたものは必ず記録して
+    WARNING でログに出力します。イベントのないタイムアウト (-TIMEOUT-) の待ち時間は
+    1 件ずつ記録せず idle に回数と合計だけを数え、その処理は slow_ms を超えたときだけ記録します。
+    ウィジェット数は widget_interval 秒ごとに数えます。
+
+    使用例:
+        profiler = EventLoopProfiler(enabled=True)
+        profiler.instrument(vtable, "refresh", "flush", prefix="table")
+        while True:
+            event, values = profiler.read(win, timeout=50)
+            with profiler.handle(event):
+                ...
+        print(profiler.summary())
+        profiler.dump("gui_profile.json")
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        capacity: int = 10000,
+        sample_rate: float = 1.0,
+        slow_ms: Optional[float] = 50.0,
+        widget_interval: float = 5.0
+    ):
+        """
+        Parameters:
+            enabled (bool): False なら計測しない
+            capacity (int): リングバッファに保持する記録の件数
+            sample_rate (float): 通常のイベントを記録する割合 (0.0〜1.0)
+            slow_ms (Optional[float]): 必ず記録してログに出すしきい値（ミリ秒）。None で無効
+            widget_interval (float): ウィジェット数を数える間隔（秒）
+        """
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.widget_interval = widget_interval
+        # (開始時刻, 種類, 名前, 所要時間[秒]) 種類は "wait" / "handler" / "section"
+        self.records: deque = deque(maxlen=capacity)
+        self.widget_counts: deque = deque(maxlen=capacity)  # (時刻, ウィジェット数)
+        self._last_widget_count = 0.0
+        self.idle = {"count": 0, "total": 0.0, "max": 0.0}  # タイムアウトで戻った待ち時間の集計
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _record(self, kind: str, name: Any, start: float, elapsed: float, sample: bool = True):
+        # sample=False の記録は slow_ms を超えたときだけ残す
+        slow = self.slow_ms is not None and elapsed * 1000 >= self.slow_ms
+        if slow:
+            logger.warning("slow %s (%.1f ms): %s", kind, elapsed * 1000, name)
+        if slow or (sample and self._sampled()):
+            self.records.append((start, kind, str(name), elapsed))
+
+    def read(self, window, timeout: Optional[int] = None):
+        """win.read を呼び、イベントを待っていた時間を記録する。"""
+        if not self.enabled:
+            return window.read(timeout=timeout)
+        start = time.perf_counter()
+        event, values = window.read(timeout=timeout)
+        end = time.perf_counter()
+        elapsed = end - start
+        if event == TIMEOUT_EVENT:
+            self.idle["count"] += 1
+            self.idle["total"] += elapsed
+            self.idle["max"] = max(self.idle["max"], elapsed)
+        elif self._sampled():
+            # イベントを待つ時間は長くて当然なので slow_ms の対象にしない
+            self.records.append((start, "wait", str(event), elapsed))
+        if end - self._last_widget_count >= self.widget_interval:
+            self._last_widget_count = end
+            self.widget_counts.append((end, count_widgets(window.window)))
+        return event, values
+
+    def handle(self, event: Any):
+        """イベントの処理時間を計測するコンテキストマネージャー。"""
+        if not self.enabled:
+            return _NULL
+        return self._measure("handler", event, sample=event != TIMEOUT_EVENT)
+
+    def measure(self, name: str):
+        """任意の区間の所要時間を計測するコンテキストマネージャー。"""
+        return self._measure("section", name) if self.enabled else _NULL
+
+    @contextlib.contextmanager
+    def _measure(self, kind: str, name: Any, sample: bool = True):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(kind, name, start, time.perf_counter() - start, sample)
+
+    def instrument(self, obj: Any, *method_names: str, prefix: Optional[str] = None):
+        """obj のメソッドを、呼ばれるたびに所要時間を記録するように置き換える。"""
+        if not self.enabled:
+            return
+        label = prefix or type(obj).__name__
+        for method_name in method_names:
+            method = getattr(obj, method_name)
+
+            @functools.wraps(method)
+            def wrapper(*args, _method=method, _name=f"{label}.{method_name}", **kwargs):
+                with self._measure("section", _name):
+                    return _method(*args, **kwargs)
+            setattr(obj, method_name, wrapper)
+
+    def to_dataframe(self):
+        """記録を pandas.DataFrame で返す。"""
+        import pandas as pd
+        return pd.DataFrame(list(self.records), columns=["start", "kind", "name", "elapsed"])
+
+    def summary(self):
+        """
+        種類・名前ごとの集計を返す。
+
+        タイムアウトの待ち時間は ("idle", "-TIMEOUT-") の 1 行にまとめます（p95 は NaN）。
+
+        Returns:
+            pandas.DataFrame: count, total, mean, p95, max（秒）を total の降順で
+        """
+        import pandas as pd
+        columns = ["count", "total", "mean", "p95", "max"]
+        df = self.to_dataframe()
+        if len(df):
+            grouped = df.groupby(["kind", "name"])["elapsed"]
+            result = grouped.agg(["count", "sum", "mean", "max"]).rename(columns={"sum": "total"})
+            result["p95"] = grouped.quantile(0.95)
+            result = result[columns]
+        else:
+            # 記録がないと elapsed が object 列になり quantile が失敗するため、空の表を返す
+            index = pd.MultiIndex.from_arrays([[], []], names=["kind", "name"])
+            result = pd.DataFrame({column: pd.Series(dtype=float) for column in columns}, index=index)
+        if self.idle["count"]:
+            result.loc[("idle", TIMEOUT_EVENT), :] = [
+                self.idle["count"], self.idle["total"], self.idle["total"] / self.idle["count"], float("nan"), self.idle["max"],
+            ]
+        result["count"] = result["count"].astype(int)
+        return result.sort_values("total", ascending=False)
+
+    def snapshot(self) -> Dict[str, List]:
+        return {
+            "records": [
+                {"start": start, "kind": kind, "name": name, "elapsed": elapsed}
+                for start, kind, name, elapsed in self.records
+            ],
+            "widget_counts": [{"time": t, "count": n} for t, n in self.widget_counts],
+            "idle": dict(self.idle),
+        }
+
+    def dump(self, path: str):
+        """記録を JSON ファイルに書き出す。"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        self.records.clear()
+        self.widget_counts.clear()
+        self.idle = {"count": 0, "total": 0.0, "max": 0.0}
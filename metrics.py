@@ -0,0 +1,206 @@
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# ヒストグラムの区間: 0.1ms から 2 倍ずつ（最後の区間は上限なし）
+_BUCKET_BASE = 1e-4
+_N_BUCKETS = 24
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PARAM = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+")
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    リテラルとパラメーターを ? に置き換え、空白をまとめた SQL（同じ形のクエリを集計するためのキー）。
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?)", sql)
+    return " ".join(sql.split())
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _BUCKET_BASE:
+        return 0
+    return min(int(math.log2(seconds / _BUCKET_BASE)) + 1, _N_BUCKETS - 1)
+
+def _bucket_upper(index: int) -> float:
+    return _BUCKET_BASE * 2 ** index
+
+class _StatementStats:
+    __slots__ = ("count", "sampled", "total_time", "max_time", "rows", "bytes", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.histogram = [0] * _N_BUCKETS
+
+    def quantile(self, q):
+        # ヒストグラムから分位点の上限値を返す（区間の上端なので最大 2 倍の誤差）
+        if self.sampled == 0:
+            return None
+        target = q * self.sampled
+        seen = 0
+        for index, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target:
+                return _bucket_upper(index)
+        return _bucket_upper(_N_BUCKETS - 1)
+
+class QueryStats:
+    """
+    SQLAlchemy エンジンのイベントから、SQL の形（fingerprint）ごとの実行統計を集計するクラス。
+
+    実行回数・遅いクエリの判定は全件、実行時間のヒストグラムと合計は sample_rate の割合で
+    サンプリングして記録します。slow_query_ms を超えたクエリは WARNING でログに出力します。
+    返却行数・取得バイト数とプールの待ち時間は Database から record_fetch / record_pool_wait で
+    記録されます（取得バイト数は DataFrame のメモリサイズ）。
+
+    使用例:
+        db = Database()
+        ...
+        print(db.stats.to_dataframe().sort_values("total_time", ascending=False).head())
+        db.stats.dump("query_stats.json")
+    """
+
+    def __init__(self, slow_query_ms: Optional[float] = 500.0, sample_rate: float = 1.0):
+        """
+        Parameters:
+            slow_query_ms (Optional[float]): 遅いクエリとしてログに出すしきい値（ミリ秒）。None で無効
+            sample_rate (float): 実行時間をヒストグラムに記録する割合 (0.0〜1.0)
+        """
+        self.slow_query_ms = slow_query_ms
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._statements: Dict[str, _StatementStats] = {}
+        self._pool_waits = 0
+        self._pool_wait_total = 0.0
+        self._pool_wait_max = 0.0
+
+    def attach(self, engine) -> "QueryStats":
+        """エンジンに実行前後のイベントを登録する。"""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        return self
+
+    def detach(self, engine):
+        event.remove(engine, "before_cursor_execute", self._before_execute)
+        event.remove(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # 開始時刻は実行ごとの context に持たせる（接続に積むと、失敗した文の分が残って以降の計測がずれる）
+        if context is not None:
+            context._query_start = time.perf_counter()
+        else:
+            conn.info["query_start"] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            start = context.__dict__.pop("_query_start", None)
+        else:
+            start = conn.info.pop("query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        key = fingerprint(statement)
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats()
+            stats.count += 1
+            if sampled:
+                stats.sampled += 1
+                stats.total_time += elapsed
+                stats.histogram[_bucket(elapsed)] += 1
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+            if cursor.rowcount is not None and cursor.rowcount > 0 and not cursor.description:
+                stats.rows += cursor.rowcount  # 更新系は影響行数
+        if self.slow_query_ms is not None and elapsed * 1000 >= self.slow_query_ms:
+            logger.warning("slow query (%.1f ms): %s", elapsed * 1000, key)
+
+    def record_fetch(self, statement: str, rows: int, nbytes: int = 0):
+        """取得した行数とバイト数を記録する（Database の fetch_* から呼ばれる）。"""
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats()
+            stats.rows += rows
+            stats.bytes += nbytes
+
+    def record_pool_wait(self, seconds: float):
+        """プールから接続を借りるまでの待ち時間を記録する。"""
+        with self._lock:
+            self._pool_waits += 1
+            self._pool_wait_total += seconds
+            if seconds > self._pool_wait_max:
+                self._pool_wait_max = seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        現在の統計を辞書で返す。
+
+        Returns:
+            dict: statements（fingerprint ごとの count, sampled, total_time, mean, p50, p95, p99,
+                max_time, rows, bytes のリスト）と pool（接続取得回数・待ち時間）
+        """
+        with self._lock:
+            statements: List[Dict[str, Any]] = []
+            for key, stats in self._statements.items():
+                # total_time はサンプリング分なので、実行回数に合わせて推定する
+                scale = stats.count / stats.sampled if stats.sampled else 0.0
+                statements.append({
+                    "statement": key,
+                    "count": stats.count,
+                    "sampled": stats.sampled,
+                    "total_time": stats.total_time * scale,
+                    "mean": stats.total_time / stats.sampled if stats.sampled else None,
+                    "p50": stats.quantile(0.5),
+                    "p95": stats.quantile(0.95),
+                    "p99": stats.quantile(0.99),
+                    "max_time": stats.max_time,
+                    "rows": stats.rows,
+                    "bytes": stats.bytes,
+                })
+            pool = {
+                "checkouts": self._pool_waits,
+                "wait_total": self._pool_wait_total,
+                "wait_max": self._pool_wait_max,
+            }
+        return {"statements": statements, "pool": pool}
+
+    def to_dataframe(self):
+        """fingerprint ごとの統計を pandas.DataFrame で返す。"""
+        import pandas as pd
+        return pd.DataFrame(self.snapshot()["statements"])
+
+    def dump(self, path: str):
+        """統計を JSON ファイルに書き出す。"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._pool_waits = 0
+            self._pool_wait_total = 0.0
+            self._pool_wait_max = 0.0
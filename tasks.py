@@ -0,0 +1,177 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# タスクからウィンドウに届くイベント（values は {"key": タスクのキー, ...}）
+TASK_PROGRESS = "-TASK-PROGRESS-"    # values["progress"]: TaskContext.progress に渡した値
+TASK_DONE = "-TASK-DONE-"            # values["result"]: 関数の戻り値
+TASK_ERROR = "-TASK-ERROR-"          # values["error"]: 送出された例外
+TASK_CANCELLED = "-TASK-CANCELLED-"
+
+class TaskCancelled(Exception):
+    """TaskContext.check() / progress() でキャンセルを検出したときに送出される例外。"""
+
+class TaskContext:
+    """
+    実行中のタスクに渡される、進捗の報告とキャンセルの確認のためのオブジェクト。
+
+    プロセスプールで実行する場合も pickle できるように、キューとイベントは
+    multiprocessing.Manager のプロキシを使います。
+    """
+
+    def __init__(self, key: Hashable, events, cancel_event):
+        self.key = key
+        self._events = events
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check(self):
+        """キャンセルされていれば TaskCancelled を送出する（ループの区切りごとに呼ぶ）。"""
+        if self._cancel_event.is_set():
+            raise TaskCancelled(self.key)
+
+    def progress(self, value: Any):
+        """進捗を報告する（同時にキャンセルも確認する）。"""
+        self.check()
+        self._events.put((TASK_PROGRESS, {"key": self.key, "progress": value}))
+
+class _Task:
+    __slots__ = ("key", "future", "cancel_event")
+
+    def __init__(self, key, future, cancel_event):
+        self.key = key
+        self.future = future
+        self.cancel_event = cancel_event
+
+class TaskRunner:
+    """
+    GUI のイベントループを止めずに、関数をスレッドプール / プロセスプールで実行するクラス。
+
+    進捗と完了はスレッドセーフなキューに積まれ、GUI 側で win.read(timeout=...) がタイムアウト
+    したときに dispatch(win) を呼ぶと、ウィンドウのイベント (TASK_DONE など) として届きます。
+    同じキーのタスクが実行中の場合は新しく実行せず、実行中のタスクの結果を共有します。
+
+    使用例:
+        tasks = TaskRunner()
+        tasks.submit("load", db.fetch_dataframe, "SELECT * FROM your_table")
+        while True:
+            event, values = win.read(timeout=50)
+            if event == "-TIMEOUT-":
+                tasks.dispatch(win)
+            elif event == TASK_DONE and values["key"] == "load":
+                df = values["result"]
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, use_processes: bool = False):
+        """
+        Parameters:
+            max_workers (Optional[int]): ワーカー数（None で Executor の既定値）
+            use_processes (bool): True でプロセスプールを使う（CPU 負荷の高い集計向け。関数と引数は pickle 可能であること）
+        """
+        self.use_processes = use_processes
+        self.executor: Executor = (
+            ProcessPoolExecutor(max_workers=max_workers) if use_processes else ThreadPoolExecutor(max_workers=max_workers)
+        )
+        self._manager = multiprocessing.Manager() if use_processes else None
+        self._events = self._manager.Queue() if use_processes else queue.Queue()
+        self._tasks: Dict[Hashable, _Task] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable, *args, with_context: bool = False, **kwargs) -> Future:
+        """
+        関数の実行を投入する。
+
+        Parameters:
+            key (Hashable): タスクを識別するキー（イベントの values["key"] になる）
+            func (Callable): 実行する関数
+            with_context (bool): True なら func の context 引数に TaskContext を渡す（進捗報告・キャンセル用）
+
+        Returns:
+            Future: 同じキーのタスクが実行中なら、そのタスクの Future
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and not task.cancel_event.is_set():
+                return task.future
+            cancel_event = self._manager.Event() if self.use_processes else threading.Event()
+            if with_context:
+                kwargs["context"] = TaskContext(key, self._events, cancel_event)
+            future = self.executor.submit(func, *args, **kwargs)
+            task = self._tasks[key] = _Task(key, future, cancel_event)
+        future.add_done_callback(lambda f: self._done(task))
+        return future
+
+    def _done(self, task: _Task):
+        with self._lock:
+            if self._tasks.get(task.key) is task:
+                del self._tasks[task.key]
+        try:
+            result = task.future.result()
+        except (CancelledError, TaskCancelled):
+            self._events.put((TASK_CANCELLED, {"key": task.key}))
+        except Exception as e:
+            self._events.put((TASK_ERROR, {"key": task.key, "error": e}))
+        else:
+            self._events.put((TASK_DONE, {"key": task.key, "result": result}))
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        タスクをキャンセルする。
+
+        開始前のタスクはそのまま取り消し、実行中のタスクは TaskContext.check() を呼んだ時点で止まります。
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+        if task is None:
+            return False
+        task.cancel_event.set()
+        task.future.cancel()
+        return True
+
+    def cancel_all(self):
+        with self._lock:
+            keys = list(self._tasks)
+        for key in keys:
+            self.cancel(key)
+
+    def running(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._tasks
+
+    def poll(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        届いているイベントをブロックせずにすべて取り出す。
+
+        同じタスクの進捗は最新のものだけを残します（描画の回数を減らすため）。
+        """
+        events = []
+        latest_progress: Dict[Hashable, int] = {}
+        while True:
+            try:
+                event, values = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event == TASK_PROGRESS:
+                index = latest_progress.get(values["key"])
+                if index is not None:
+                    events[index] = None
+                latest_progress[values["key"]] = len(events)
+            events.append((event, values))
+        return [e for e in events if e is not None]
+
+    def dispatch(self, window):
+        """届いているイベントをウィンドウのイベントとして投入する（GUI のスレッドから呼ぶ）。"""
+        for event, values in self.poll():
+            window.post_event(event, values)
+
+    def shutdown(self, cancel: bool = True):
+        if cancel:
+            self.cancel_all()
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+        if self._manager is not None:
+            self._manager.shutdown()
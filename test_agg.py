@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from agg import StreamingAggregator, aggregate_transform_multi, aggregate_transform_stream
+
+def make_df():
+    return pd.DataFrame({
+        'a': [1, 1, 2, 2],
+        'b': [3, 3, 4, 5],
+        'v': [1.0, 2.0, 3.0, 4.0],
+        'x': [100.0, 200.0, 300.0, 400.0],
+    })
+
+def test_stream_empty_filter_multi_key():
+    df = make_df()
+    kwargs = dict(x_col='x', x_range=(0, 1))
+    expected = aggregate_transform_multi(df, ['mean', 'max'], ['a', 'b'], 'v', **kwargs)
+    result = pd.concat(aggregate_transform_stream(lambda: [df.iloc[:2], df.iloc[2:]], ['mean', 'max'], ['a', 'b'], 'v', **kwargs))
+    assert result.isna().all().all()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_result_empty_filter_multi_key_index_names():
+    table = StreamingAggregator(['a', 'b'], 'v', x_col='x', x_range=(0, 1)).update(make_df()).result(['mean'])
+    assert table.empty
+    assert list(table.index.names) == ['a', 'b']
+
+def test_stream_matches_multi():
+    df = make_df()
+    expected = aggregate_transform_multi(df, ['mean', 'std', 'count'], ['a', 'b'], 'v')
+    result = pd.concat(aggregate_transform_stream(lambda: [df.iloc[:3], df.iloc[3:]], ['mean', 'std', 'count'], ['a', 'b'], 'v'))
+    assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
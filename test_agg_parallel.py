@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from agg import aggregate_transform_multi
+from agg_parallel import aggregate_transform_parallel
+
+AGGS = {'arith_mean': 'mean', 'max_value': 'max', 'count': 'count', 'std': 'std'}
+
+def test_parallel_matches_serial_signed_zero_and_nan_keys():
+    rng = np.random.default_rng(0)
+    n = 20000
+    df = pd.DataFrame({
+        'k1': rng.choice([0.0, -0.0, np.nan, 1.5, -2.0], n),
+        'k2': rng.choice([-0.0, 0.0, np.nan], n),
+        'v': rng.uniform(0.5, 5.0, n),
+    })
+    expected = aggregate_transform_multi(df, AGGS, ['k1', 'k2'], 'v')
+    result = aggregate_transform_parallel(df, AGGS, ['k1', 'k2'], 'v', max_workers=2, n_partitions=7, min_rows=0)
+    assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+def test_parallel_matches_serial_string_keys():
+    rng = np.random.default_rng(1)
+    n = 5000
+    df = pd.DataFrame({
+        'k': rng.choice(['a', 'b', None, 'c'], n),
+        'v': rng.uniform(0.5, 5.0, n),
+    })
+    expected = aggregate_transform_multi(df, AGGS, ['k'], 'v')
+    result = aggregate_transform_parallel(df, AGGS, ['k'], 'v', max_workers=2, min_rows=0)
+    assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
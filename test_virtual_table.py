@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from virtual_table import DataFrameSource, VirtualTable
+
+def make_table(n_rows=3):
+    # Treeview を作らずに、描画以外の状態だけを持つ VirtualTable を作る
+    vt = object.__new__(VirtualTable)
+    vt.source = DataFrameSource(pd.DataFrame({'a': range(n_rows), 'b': range(n_rows)}))
+    vt.page_size = 200
+    vt.max_pages = 8
+    vt._pages = {}
+    vt._patches = {}
+    vt._appended = []
+    vt._dirty = set()
+    vt._schedule = lambda: None
+    return vt
+
+def test_update_rows_appends_at_end():
+    vt = make_table()
+    vt.update_rows({3: [10, 11], 4: [12, 13]})
+    assert len(vt) == 5
+    assert list(vt.get_row(3)) == [10, 11]
+    assert list(vt.get_row(4)) == [12, 13]
+
+def test_update_rows_gap_raises_without_changes():
+    vt = make_table()
+    with pytest.raises(IndexError):
+        vt.update_rows({0: [7, 7], 5: [1, 2]})
+    assert len(vt) == 3
+    assert vt._patches == {}
+    assert not vt._dirty
+
+def test_update_rows_negative_raises():
+    vt = make_table()
+    with pytest.raises(IndexError):
+        vt.update_rows({-1: [1, 2]})
+
+def test_update_cells_patches_source_and_appended_rows():
+    vt = make_table()
+    vt.update_rows({3: [10, 11]})
+    vt.update_cells({(0, 'b'): 99, (3, 0): 42})
+    assert list(vt.get_row(0)) == [0, 99]
+    assert list(vt.get_row(3)) == [42, 11]
+
+@pytest.mark.parametrize('patches', [
+    {(0, 0): 7, (3, 0): 1},
+    {(0, 0): 7, (-1, 0): 1},
+    {(0, 0): 7, (1, 2): 1},
+    {(0, 0): 7, (1, 'missing'): 1},
+])
+def test_update_cells_out_of_range_raises_without_changes(patches):
+    vt = make_table()
+    with pytest.raises(IndexError):
+        vt.update_cells(patches)
+    assert vt._patches == {}
+    assert not vt._dirty
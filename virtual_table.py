@@ -0,0 +1,386 @@
+import tkinter as tk
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+class DataFrameSource:
+    """pandas.DataFrame を行番号で部分的に読み出すデータソース。"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.headings = [str(c) for c in df.columns]
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def rows(self, start: int, stop: int) -> List[Sequence[Any]]:
+        return self.df.iloc[start:stop].to_numpy(dtype=object).tolist()
+
+class ArraySource:
+    """2 次元の numpy.ndarray（np.load(..., mmap_mode='r') も可）を行番号で読み出すデータソース。"""
+
+    def __init__(self, array: np.ndarray, headings: Optional[List[str]] = None):
+        self.array = array
+        self.headings = headings if headings is not None else [f"col{i}" for i in range(array.shape[1])]
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def rows(self, start: int, stop: int) -> List[Sequence[Any]]:
+        return self.array[start:stop].tolist()
+
+class QuerySource:
+    """
+    Database のクエリ結果を LIMIT / OFFSET のページ単位で読み出すデータソース。
+
+    行数は最初に 1 回だけ count(*) で取得します。ORDER BY を含むクエリを渡してください
+    （含まないとページ間で行の順序が保証されません）。
+    """
+
+    def __init__(self, db, sql: str, params: Optional[Dict[str, Any]] = None):
+        self.db = db
+        self.sql = sql
+        self.params = dict(params or {})
+        self._len = db.fetch_one(f"SELECT count(*) FROM ({sql}) AS q", self.params)[0]
+        self.headings = list(self._page(0, 1).columns)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _page(self, start: int, stop: int) -> pd.DataFrame:
+        params = dict(self.params, _vt_limit=stop - start, _vt_offset=start)
+        return self.db.fetch_dataframe(f"{self.sql} LIMIT :_vt_limit OFFSET :_vt_offset", params)
+
+    def rows(self, start: int, stop: int) -> List[Sequence[Any]]:
+        return self._page(start, stop).to_numpy(dtype=object).tolist()
+
+def default_formatter(value: Any) -> str:
+    """セルの値を表示用の文字列にする（float は有効数字 6 桁、NaN/None は空欄）。"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if value != value else f"{value:.6g}"
+    return str(value)
+
+class VirtualTable:
+    """
+    eg.Table（ttk.Treeview）に、見えている行だけを表示する仮想スクロールを追加するクラス。
+
+    Treeview には表示できる行数分のアイテムだけを作り、スクロール時はその値を入れ替えます。
+    データソースからはページ単位 (page_size 行) で読み込み、最近のページだけを保持するため、
+    起動時間とメモリ使用量はデータの行数によらずほぼ一定です。セルの文字列化は表示時に行います。
+
+    update_cells / update_rows で渡したセルの変更はデータソースに重ねて保持し、frame_ms ミリ秒の間に
+    届いた変更をまとめて 1 回で描画します。描画時は表示中の文字列と比較し、変わったセルだけを更新します。
+
+    使用例:
+        tbl = eg.Table(key="-table-", values=[], headings=source.headings, expand_y=True)
+        win = eg.Window("...", [[tbl]])
+        vt = VirtualTable(tbl, source)
+    """
+
+    def __init__(
+        self,
+        table,
+        source,
+        page_size: int = 200,
+        max_pages: int = 8,
+        formatter: Callable[[Any], str] = default_formatter,
+        frame_ms: int = 33
+    ):
+        """
+        Parameters:
+            table (eg.Table): ウィンドウ作成済みの Table 要素
+            source: __len__ と rows(start, stop) を持つデータソース
+            page_size (int): データソースから 1 回に読み込む行数
+            max_pages (int): 保持するページ数（スクロール用のバッファ）
+            formatter (Callable[[Any], str]): セルの値を文字列にする関数
+            frame_ms (int): セルの変更をまとめて描画する間隔（ミリ秒）
+        """
+        self.table = table
+        self.tree = table.widget
+        self.source = source
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.formatter = formatter
+        self.frame_ms = frame_ms
+        self.offset = 0
+        self.n_visible = 0
+        self.selected: Optional[int] = None  # 選択中の行（データソース上の行番号）
+        self._pages: "OrderedDict[int, List[Sequence[Any]]]" = OrderedDict()
+        self._patches: Dict[int, Dict[int, Any]] = {}  # 行番号 -> {列番号: 値}（データソースに重ねる変更）
+        self._appended: List[List[Any]] = []  # データソースの末尾に追加した行
+        self._rendered: List[Tuple[str, ...]] = []  # Treeview の各アイテムに表示中の文字列
+        self._dirty: set = set()  # 描画待ちの行番号
+        self._flush_id = None
+        self.scrollbar = self._find_scrollbar()
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.tree.configure(yscrollcommand=lambda *args: None)  # Treeview 自体はスクロールさせない
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+        self.tree.bind("<Up>", lambda e: self._on_key(-1))
+        self.tree.bind("<Down>", lambda e: self._on_key(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.n_visible))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.n_visible))
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.set_source(source)
+
+    def _find_scrollbar(self) -> tk.Scrollbar:
+        for child in self.table.frame.winfo_children():
+            if isinstance(child, tk.Scrollbar) and str(child.cget("orient")) == "vertical":
+                return child
+        raise RuntimeError("Table の縦スクロールバーが見つかりません")
+
+    def _row_height(self) -> int:
+        from tkinter import font as tkfont, ttk
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        if height:
+            return int(height)
+        font = self.table.font or ("TkDefaultFont",)
+        return tkfont.Font(font=font).metrics("linespace") + 4
+
+    def set_source(self, source):
+        """データソースを差し替えて先頭から表示し直す。"""
+        self.source = source
+        self._update_headings()
+        self._pages.clear()
+        self._patches.clear()
+        self._appended.clear()
+        self._dirty.clear()
+        self.offset = 0
+        self.selected = None
+        self._resize(max(int(self.tree.cget("height")), 1))
+
+    def _update_headings(self):
+        # 見出しと幅をデータソースに合わせる。列が足りなければ Treeview の列を増やす
+        headings = list(self.source.headings)
+        columns = list(self.tree["columns"])
+        if len(headings) > len(columns):
+            # columns を設定し直すと列の設定が初期化されるため、既存の列の幅と配置を戻す
+            saved = [(self.tree.column(c, "width"), self.tree.column(c, "stretch"), self.tree.column(c, "anchor")) for c in columns]
+            columns = [i + 1 for i in range(len(headings))]  # eg.Table と同じ 1 始まりの列 ID
+            self.tree.configure(columns=columns, displaycolumns=columns)
+            for column, (width, stretch, anchor) in zip(columns, saved):
+                self.tree.column(column, width=width, stretch=stretch, anchor=anchor)
+            if hasattr(self.table, "max_columns"):
+                self.table.max_columns = len(columns)
+        for i, column in enumerate(columns):
+            label = headings[i] if i < len(headings) else ""
+            self.tree.heading(column, text=label, anchor="center")
+            if not label:
+                self.tree.column(column, width=0, stretch=False)
+            elif int(self.tree.column(column, "width")) == 0:
+                self.tree.column(column, width=100)
+
+    def _resize(self, n_visible: int):
+        # Treeview のアイテム数を表示できる行数に合わせる
+        children = self.tree.get_children()
+        for iid in children[n_visible:]:
+            self.tree.delete(iid)
+        for i in range(len(children), n_visible):
+            self.tree.insert("", "end", iid=str(i), values=())
+        self._rendered = (self._rendered + [()] * n_visible)[:n_visible]
+        self.n_visible = n_visible
+        self.refresh()
+
+    def _on_configure(self, event):
+        n_visible = max((event.height - self._row_height()) // self._row_height(), 1)  # 見出し行を除く
+        if n_visible != self.n_visible:
+            self._resize(n_visible)
+
+    def _get_page(self, page_no: int) -> List[Sequence[Any]]:
+        page = self._pages.get(page_no)
+        if page is None:
+            start = page_no * self.page_size
+            page = self.source.rows(start, min(start + self.page_size, len(self.source)))
+            self._pages[page_no] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_no)
+        return page
+
+    def __len__(self) -> int:
+        return len(self.source) + len(self._appended)
+
+    def get_row(self, index: int) -> Sequence[Any]:
+        """元の値のままの 1 行を返す（update_cells / update_rows の変更を反映済み）。"""
+        n_source = len(self.source)
+        if index >= n_source:
+            return self._appended[index - n_source]
+        page = self._get_page(index // self.page_size)
+        row = page[index % self.page_size]
+        patch = self._patches.get(index)
+        if patch:
+            row = list(row)
+            for col, value in patch.items():
+                row[col] = value
+        return row
+
+    def format_row(self, index: int) -> List[str]:
+        return [self.formatter(value) for value in self.get_row(index)]
+
+    def refresh(self):
+        """現在の表示位置の行を描き直す。"""
+        total = len(self)
+        self.offset = max(0, min(self.offset, total - self.n_visible))
+        for i in range(self.n_visible):
+            index = self.offset + i
+            self._render(i, tuple(self.format_row(index)) if index < total else ())
+        # 選択は行番号で保持し、表示範囲内にあるときだけ対応するアイテムを選択する
+        if self.selected is not None and self.offset <= self.selected < self.offset + self.n_visible:
+            iid = str(self.selected - self.offset)
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self)
+        if total:
+            self.scrollbar.set(self.offset / total, min((self.offset + self.n_visible) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _render(self, item: int, values: Tuple[str, ...]):
+        # 表示中の文字列と比べ、変わったセルだけを Treeview に反映する
+        current = self._rendered[item]
+        if values == current:
+            return
+        if len(values) != len(current):
+            self.tree.item(str(item), values=values)
+        else:
+            for col, (new, old) in enumerate(zip(values, current)):
+                if new != old:
+                    self.tree.set(str(item), col + 1, new)  # eg.Table の列 ID は 1 始まり
+        self._rendered[item] = values
+
+    def update_cells(self, patches: Union[Dict[Tuple[int, Union[int, str]], Any], Iterable[Tuple[int, Union[int, str], Any]]]):
+        """
+        セルの値を変更する（描画は frame_ms 後にまとめて行う）。
+
+        Parameters:
+            patches: {(行番号, 列): 値} または (行番号, 列, 値) の並び。列は番号か見出し名
+
+        Raises:
+            IndexError: 行番号または列が範囲外の場合（どのセルも変更しない）
+        """
+        items = ((row, col, value) for (row, col), value in patches.items()) if isinstance(patches, dict) else patches
+        headings = list(self.source.headings)
+        total = len(self)
+        resolved = []
+        for row, col, value in items:
+            index = col if isinstance(col, int) else (headings.index(col) if col in headings else -1)
+            if not 0 <= index < len(headings):
+                raise IndexError(f"列 {col!r} は範囲外です（列数 {len(headings)}）")
+            if not 0 <= row < total:
+                raise IndexError(f"行番号 {row} は範囲外です（0〜{total - 1}）")
+            resolved.append((row, index, value))
+        n_source = len(self.source)
+        for row, col, value in resolved:
+            if row >= n_source:
+                appended = self._appended[row - n_source]
+                if col >= len(appended):
+                    appended.extend([None] * (col + 1 - len(appended)))
+                appended[col] = value
+            else:
+                self._patches.setdefault(row, {})[col] = value
+            self._dirty.add(row)
+        self._schedule()
+
+    def update_rows(self, rows: Dict[int, Sequence[Any]]):
+        """
+        行の値をまとめて変更する。行番号が現在の行数と等しい行は末尾に追加する
+        （連続した行番号なら複数行を追加できる）。
+
+        Parameters:
+            rows (Dict[int, Sequence[Any]]): {行番号: 行の値}
+
+        Raises:
+            IndexError: 行番号が負、または追加すると間が空く場合（どの行も変更しない）
+        """
+        n_source = len(self.source)
+        items = sorted(rows.items())
+        total = len(self)
+        for row, _ in items:
+            if row < 0 or row > total:
+                raise IndexError(f"行番号 {row} は範囲外です（0〜{total}）")
+            if row == total:
+                total += 1
+        for row, values in items:
+            if row >= len(self):
+                self._appended.append(list(values))
+            elif row >= n_source:
+                self._appended[row - n_source] = list(values)
+            else:
+                self._patches[row] = dict(enumerate(values))
+            self._dirty.add(row)
+        self._schedule()
+
+    def _schedule(self):
+        if self._flush_id is None:
+            self._flush_id = self.tree.after(self.frame_ms, self.flush)
+
+    def flush(self):
+        """描画待ちの変更を反映する（表示範囲外の行は、スクロールしたときに描画される）。"""
+        if self._flush_id is not None:
+            self.tree.after_cancel(self._flush_id)
+            self._flush_id = None
+        dirty, self._dirty = self._dirty, set()
+        total = len(self)
+        for index in dirty:
+            if self.offset <= index < self.offset + self.n_visible and index < total:
+                self._render(index - self.offset, tuple(self.format_row(index)))
+        self._update_scrollbar()  # 行が追加されると位置が変わる
+
+    def scroll(self, n_rows: int):
+        """n_rows 行スクロールする（負の値で上へ）。"""
+        self.scroll_to(self.offset + n_rows)
+        return "break"
+
+    def scroll_to(self, index: int):
+        """index 行目が先頭に来るようにスクロールする。"""
+        self.offset = index
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self)))
+        elif args[0] == "scroll":
+            step = self.n_visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            return self.scroll(-3)
+        return self.scroll(3)
+
+    def _on_key(self, direction: int):
+        # 表示範囲の端でカーソルを動かしたときは、選択を保ったままスクロールする
+        if self.selected is None:
+            return None
+        target = max(0, min(self.selected + direction, len(self) - 1))
+        if self.offset <= target < self.offset + self.n_visible:
+            return None  # Treeview の既定の動作に任せる
+        self.selected = target
+        self.offset += direction
+        self.refresh()
+        self.tree.focus(str(target - self.offset))
+        return "break"
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.offset + int(selection[0])
+
+    def get_selected_index(self) -> Optional[int]:
+        """選択中の行の、データソース上の行番号を返す（未選択なら None）。"""
+        return self.selected
+
+    def get_selected_row(self) -> Optional[Sequence[Any]]:
+        """選択中の行の元の値を返す（未選択なら None）。"""
+        return None if self.selected is None else self.get_row(self.selected)
@@ -0,0 +1,152 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, Dict, Hashable, List, Optional, Set
+
+# state を切り替える対象のウィジェット
+STATEFUL_WIDGETS = (
+    tk.Button, ttk.Button, tk.Entry, ttk.Entry, ttk.Combobox, tk.Text,
+    tk.Checkbutton, ttk.Checkbutton, tk.Radiobutton, ttk.Radiobutton, tk.Scale, tk.Listbox,
+)
+# 読み取り専用 ("readonly") にできるウィジェット（それ以外のウィジェットは読み取り専用にしない）
+READONLY_WIDGETS = (tk.Entry, ttk.Entry, ttk.Combobox)
+
+class _Group:
+    __slots__ = ("key", "parent", "children", "widgets")
+
+    def __init__(self, key, parent):
+        self.key = key
+        self.parent = parent
+        self.children: List[Hashable] = []
+        self.widgets: Dict[str, tk.Widget] = {}  # ウィジェット名 -> ウィジェット（追加順）
+
+class WidgetRegistry:
+    """
+    状態を切り替えるウィジェットを、タブなどのグループのキーごとに索引するクラス。
+
+    ウィジェットは作成時に register / index で登録し、グループは入れ子にできます。
+    set_state / set_readonly / hide / show はグループ（と子グループ）に登録済みの
+    ウィジェットだけを対象にし、現在と同じ状態のウィジェットは設定し直しません。
+    破棄されたウィジェットは <Destroy> イベントで自動的に登録を外します。
+
+    使用例:
+        registry = WidgetRegistry()
+        registry.index("-TAB1-", win["-TAB1-"].widget)  # 作成済みのタブを 1 回だけ走査して登録
+        registry.register("-TAB1-", new_input.widget)   # 後から追加したウィジェット
+        registry.set_state("-TAB1-", "disabled")
+    """
+
+    def __init__(self):
+        self._groups: Dict[Hashable, _Group] = {}
+        self._group_of: Dict[str, Hashable] = {}  # ウィジェット名 -> グループのキー
+        self._states: Dict[str, str] = {}  # ウィジェット名 -> 最後に設定した state
+        self._hidden: Dict[str, Dict[str, Any]] = {}  # 非表示にしたウィジェット名 -> 元の pack 情報
+
+    def add_group(self, key: Hashable, parent: Optional[Hashable] = None) -> Hashable:
+        """グループを作成する（parent を指定すると、その子グループになる）。"""
+        if key in self._groups:
+            return key
+        if parent is not None:
+            self.add_group(parent)
+            self._groups[parent].children.append(key)
+        self._groups[key] = _Group(key, parent)
+        return key
+
+    def register(self, group: Hashable, widget: tk.Widget):
+        """ウィジェットをグループに登録する（Element を渡した場合はその widget を登録する）。"""
+        widget = getattr(widget, "widget", widget)
+        name = str(widget)
+        self.add_group(group)
+        previous = self._group_of.get(name)
+        if previous is not None:
+            del self._groups[previous].widgets[name]
+        else:
+            widget.bind("<Destroy>", lambda e, name=name: self._forget(name, e), add="+")
+        self._groups[group].widgets[name] = widget
+        self._group_of[name] = group
+
+    def index(self, group: Hashable, root: tk.Widget, stateful=STATEFUL_WIDGETS) -> int:
+        """
+        root 以下の状態を持つウィジェットをすべてグループに登録する（作成時に 1 回だけ呼ぶ）。
+
+        Returns:
+            int: 登録したウィジェットの数
+        """
+        root = getattr(root, "widget", root)
+        count = 0
+        stack = [root]
+        while stack:
+            widget = stack.pop()
+            if isinstance(widget, stateful) and str(widget) not in self._group_of:
+                self.register(group, widget)
+                count += 1
+            stack.extend(widget.winfo_children())
+        self.add_group(group)
+        return count
+
+    def unregister(self, widget: tk.Widget):
+        self._forget(str(getattr(widget, "widget", widget)))
+
+    def _forget(self, name: str, event=None):
+        # <Destroy> は子ウィジェットの破棄でも親にバインドした関数が呼ばれるため、本人の破棄だけを扱う
+        if event is not None and str(event.widget) != name:
+            return
+        group = self._group_of.pop(name, None)
+        if group is not None:
+            self._groups[group].widgets.pop(name, None)
+        self._states.pop(name, None)
+        self._hidden.pop(name, None)
+
+    def widgets(self, group: Hashable) -> List[tk.Widget]:
+        """グループと、その子グループに登録されたウィジェットを返す。"""
+        result: List[tk.Widget] = []
+        stack = [group]
+        while stack:
+            g = self._groups[stack.pop()]
+            result.extend(g.widgets.values())
+            stack.extend(reversed(g.children))
+        return result
+
+    def _configure_state(self, widget: tk.Widget, state: str):
+        name = str(widget)
+        if self._states.get(name) != state:
+            widget.configure(state=state)
+            self._states[name] = state
+
+    def set_state(self, group: Hashable, state: str):
+        """グループのウィジェットの state ("normal" / "disabled") をまとめて設定する。"""
+        for widget in self.widgets(group):
+            self._configure_state(widget, state)
+
+    def set_readonly(self, group: Hashable, readonly: bool = True):
+        """グループの入力欄を読み取り専用にする（False で元に戻す）。"""
+        for widget in self.widgets(group):
+            if isinstance(widget, READONLY_WIDGETS):
+                self._configure_state(widget, "readonly" if readonly else "normal")
+
+    def hide(self, group: Hashable):
+        """グループのウィジェットを非表示にする（pack で配置されたウィジェットが対象）。"""
+        for widget in self.widgets(group):
+            name = str(widget)
+            if name in self._hidden or widget.winfo_manager() != "pack":
+                continue
+            info = widget.pack_info()
+            # 再表示するときに元の順序に戻せるよう、直後のウィジェットを覚えておく
+            siblings = info["in"].pack_slaves()
+            position = siblings.index(widget)
+            info["_next"] = siblings[position + 1] if position + 1 < len(siblings) else None
+            self._hidden[name] = info
+            widget.pack_forget()
+
+    def show(self, group: Hashable):
+        """hide で非表示にしたウィジェットを元の位置に戻す。"""
+        for widget in reversed(self.widgets(group)):
+            info = self._hidden.pop(str(widget), None)
+            if info is None:
+                continue
+            following = info.pop("_next")
+            if following is not None and following.winfo_exists() and following.winfo_manager() == "pack":
+                info["before"] = following
+            widget.pack(**info)
+
+    def groups(self) -> Set[Hashable]:
+        return set(self._groups)